@@ -3,7 +3,23 @@ import numpy as np
 import time
 from knob import RotaryEncoderArray as REA
 import os
-import random
+import sys
+import atexit
+import signal
+from brush import stamp_spot
+from animation_replay import open_player, StrokeLogWriter
+from capture_writer import CaptureWriter
+from gallery import Gallery
+from frame_tap import FrameTapWriter
+from knob_station import RemoteInputMerger
+from tiled_render import TiledRenderer
+from config_watcher import ConfigWatcher
+from canvas_state import CanvasState
+from output_rate import AdaptiveOutputRate, frame_to_send
+from dirty_canvas import DirtyCanvas
+from sampling_profiler import SamplingProfiler, loop_stage
+from loop_watchdog import LoopWatchdog
+from universe_pacing import UniversePacer
 
 # Define multiple encoder pairs (X,Y)
 encoder_pins = [
@@ -25,22 +41,49 @@ max_values = [37,61, 37, 61, 37, 61, 37, 61]  # X1_MAX, Y1_MAX, X2_MAX, Y2_MAX
 # Create encoder array
 encoders = REA(encoder_pins, min_values, max_values,button_pins)
 
-receivers = [
-            # Primary display receivers (frame 0)
-            [
-                {
-                    'ip': '192.168.68.111',
-                    'pixel_count': 2356,
-                    'addressing_array': imdmx.make_indicesHS(r"layout.txt")
-                }
-            ]]
+# Knob stations on other boards (knob_station.py) listed by station id; their
+# encoders follow the local ones, each station wired the same as this board
+remote_stations = []
+if remote_stations:
+    encoders = RemoteInputMerger(remote_stations, len(encoder_pins), min_values, max_values, local=encoders)
 
 dat = np.zeros([38,62,3]).astype(np.uint8)
 
+# Primary display receivers (frame 0); pixel_count defaults to every pixel in the layout
+default_receivers = [
+    {
+        'ip': '192.168.68.111',
+        'layout': "layout.txt",
+    }
+]
+
+# A receiver config such as receivers.json (or a plan compiled from one with
+# receiver_config.py) replaces the hand-written receivers above, with universes
+# assigned per output. Edits to it, or to the layout files of either, are picked up while running.
+receiver_plan = None
+config_watcher = ConfigWatcher(receiver_plan or default_receivers, dat.shape[:2])
+receivers = [config_watcher.receivers]
+
+# Tracks the lit extent and the areas changed since the last send, so decay and
+# sending only touch the parts of the canvas where something is happening
+canvas = DirtyCanvas(dat.shape)
+dat = canvas.pixels
+
+# Render with one process per receiver (tiled_render.py): each decays, stamps and
+# sends its own part of a shared-memory canvas. Worth it once the wall outgrows one core.
+tiled = False
+
+# Spread each send's universes over this fraction of the send interval (3 frames)
+# rather than one burst, if the controller or switch drops packets as universes grow.
+# The loop waits out the window, so it adds up to that much latency; 0 sends in a burst.
+pace_fraction = 0.0
+pacer = UniversePacer(3 / 120, pace_fraction) if pace_fraction > 0 else None
+pace_debt = 0.0
+
 screens = []
-for i in range(len(receivers)):
+for i in range(len(receivers) if not tiled else 0):
     if i < len(receivers):
-        screens.append(imdmx.SACNPixelSender(receivers[i]))
+        screens.append(imdmx.SACNPixelSender(receivers[i], pacer=pacer))
     else:
         # For displays without physical receivers, add None as placeholder
         screens.append(None)
@@ -55,6 +98,8 @@ pair_colors = [
     [255, 0, 255],  # Magenta for pair 5
     [0, 255, 255],  # Cyan for pair 6
 ]
+if config_watcher is not None and config_watcher.pair_colors:
+    pair_colors = config_watcher.pair_colors
 
 # Store last positions to detect changes
 
@@ -68,7 +113,91 @@ load_image_time=100
 decay_rate=0.995
 time_switch=1
 last_load_time = 0
+
+renderer = None
+tile_decay = False
+if tiled:
+    renderer = TiledRenderer(receivers[0], dat.shape, pair_colors, decay_rate)
+    dat = renderer.canvas
+if config_watcher is not None:
+    if renderer is None:
+        config_watcher.start_update_thread()
+    else:
+        print("Config reload is not available in tiled mode; restart to apply changes")
+
+# The canvas and render state are mirrored every frame to a memory-mapped file
+# (e.g. /dev/shm/canvas_state.fss to survive restarts only), so a restart resumes the
+# drawing. The saved frame goes out before anything below is set up.
+state_path = "canvas_state.fss"
+canvas_state = CanvasState(state_path, dat.shape, len(last_positions))
+if canvas_state.restored:
+    saved = canvas_state.load()
+    time_thresh = saved['time_thresh']
+    time_switch = saved['time_switch']
+    time_last_update = time.time() - saved['idle']
+    encoders.restore(saved['positions'], saved['buttons'])
+    last_positions = encoders.get_positions().copy()
+    last_buttons = encoders.get_buttons()
+    if renderer is None:
+        canvas.load(saved['canvas'])
+        screens[0].send(canvas.take_dirty()[0])
+    else:
+        renderer.load(saved['canvas'])
+        renderer.render(last_positions, last_buttons, send=True)
+    print(f"Resumed canvas saved {time.time() - saved['saved']:.0f}s ago")
+
+# Once the canvas stops changing (faded out, static gallery image) only a keepalive
+# frame is sent each second; any change or knob movement restores the full rate
+output_rate = AdaptiveOutputRate(keepalive_interval=1.0)
+
+# Every rendered frame is published to shared memory for other processes to follow
+frame_tap = FrameTapWriter(dat.shape)
+
+# Idle captures are compressed and written off the render loop
+capture_writer = CaptureWriter()
+
+# Stills from filtered_saves, indexed and decoded in the background for the gallery idle mode
+gallery = Gallery("filtered_saves")
+
+# What to show once the idle timer runs out:
+#   "gallery" - a random still from filtered_saves every load_image_time seconds
+#   "replay"  - stream a recorded animation (.fsa frames or .fsl stroke log) from replay_path
+idle_mode = "gallery"
+replay_path = "animations/idle.fsa"
+replay_speed = 1.0
+replay_player = None
+if idle_mode == "replay":
+    try:
+        replay_player = open_player(replay_path, pair_colors, decay_rate=decay_rate, speed=replay_speed)
+        print(f"Idle replay loaded from {replay_path} ({replay_player.duration:.0f}s)")
+    except Exception as e:
+        print(f"Error opening replay {replay_path}, falling back to gallery: {e}")
+        idle_mode = "gallery"
+
+# Record every frame's knob state to a stroke log that the replay mode can play back
+record_strokes = False
+stroke_log = None
+if record_strokes:
+    os.makedirs("animations", exist_ok=True)
+    stroke_log = StrokeLogWriter(os.path.join("animations", f"strokes_{time.strftime('%Y%m%d-%H%M%S')}.fsl"),
+                                 dat.shape[0], dat.shape[1], len(last_positions))
+    # The header's record count is written on close; systemctl stop sends SIGTERM,
+    # so turn that into a normal exit for the atexit handler to run
+    atexit.register(stroke_log.close)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+# systemctl kill -s USR1 fs-script.service starts (and stops) a sampling profile of
+# all threads, tagged with the loop stage below, written to profiles/ for flame graphs
+profiler = SamplingProfiler(duration=30.0)
+profiler.install_signal_handler()
+
+# Frames that take longer than stall_threshold are logged with the main thread's
+# stack to logs/stalls.log; under systemd WATCHDOG=1 is only sent while frames flow
+watchdog = LoopWatchdog(stall_threshold=0.25)
+
 while True:
+    watchdog.beat()
+    loop_stage.set('input')
     buttons=encoders.get_buttons()
     if not np.array_equal(buttons, last_buttons):
         last_buttons=buttons
@@ -81,13 +210,19 @@ while True:
             time_thresh=time_thresh*0.9
         time_last_update=time.time()
         time_switch=0
+        output_rate.wake()
 
         #print(positions)
     # Fade the entire image
     #dat = dat * 0.9995
     #print(encoders.get_button_presses())
     # Get pairs of positions (X,Y coordinates)
-    num_pairs = len(positions) // 2
+    loop_stage.set('render')
+    num_pairs = len(positions) // 2 if renderer is None else 0
+    if renderer is not None:
+        # Decay, stamping and sending all happen in the tile workers
+        renderer.render(positions, buttons, decay=tile_decay, send=frame_counter == 2)
+        tile_decay = False
     
     # Update each pair's position with its unique color
     for i in range(num_pairs):
@@ -100,70 +235,48 @@ while True:
         # Set the pixel at the current position to full brightness with unique color
         size = buttons[i*2]
         
-        # Calculate radius based on size value (0-4)
-        radius = int(0.5+size * 0.75)  # Size 0 = radius 0, Size 4 = radius 2
-        
-        # Create coordinates for all pixels within radius
-        y_indices, x_indices = np.ogrid[-radius:radius+1, -radius:radius+1]
-        # Calculate distance from center for each pixel
-        distances = np.sqrt(x_indices**2 + y_indices**2)
-        
-        # Calculate intensity falloff (1.0 at center, decreasing outward)
-        intensity = np.clip(1.0 - distances/max(0.5+size * 0.75, 1), 0, 1)**2
-        
-        # Calculate bounds for the spot
-        # Calculate bounds for the spot
-        # Calculate bounds for the spot
-        y_min = max(0, y - radius)
-        y_max = min(dat.shape[1] - 1, y + radius)
-        x_min = max(0, x - radius)
-        x_max = min(dat.shape[0] - 1, x + radius)
-        
-        # Make sure we have valid ranges before proceeding
-        if y_min <= y_max and x_min <= x_max:
-            # Calculate indices within array bounds
-            array_y_indices = np.arange(y_min, y_max + 1)
-            array_x_indices = np.arange(x_min, x_max + 1)
-            
-            # Ensure we have non-empty arrays
-            if len(array_y_indices) > 0 and len(array_x_indices) > 0:
-                # Adjust distances/intensities to match array bounds
-                y_offset = y_min - (y - radius)
-                x_offset = x_min - (x - radius)
-                sub_intensity = intensity[y_offset:y_offset + len(array_y_indices), 
-                                        x_offset:x_offset + len(array_x_indices)]
-                
-                # Get the intensity matrix properly shaped for broadcasting
-                intensity_matrix = sub_intensity.T
-                
-                # Apply the spot with intensity falloff for each color channel
-                for color_channel in range(3):
-                    color_value = pair_colors[color_index][color_channel]
-                    
-                    # Direct indexing to avoid dimension issues
-                    current_values = dat[x_min:x_max+1, y_min:y_max+1, color_channel]
-                    new_values = (intensity_matrix * color_value).astype(np.uint8)
-                    
-                    # Update with maximum values
-                    dat[x_min:x_max+1, y_min:y_max+1, color_channel] = np.maximum(
-                        current_values, new_values
-                    )
+        canvas.mark(stamp_spot(dat, x, y, size, pair_colors[color_index]))
 
     
+    # Share the finished frame with any external readers (preview, recorder, ...)
+    loop_stage.set('publish')
+    frame_tap.publish(dat)
+
     # Sleep for 1/120 second (120 FPS)
-    time.sleep(1/120)
+    loop_stage.set('sleep')
+    # A paced send already spent part of the following frames' time
+    frame_sleep = 1/120 - pace_debt
+    pace_debt = max(0.0, -frame_sleep)
+    if frame_sleep > 0:
+        time.sleep(frame_sleep)
     
     # Only send updates every 3rd frame
     frame_counter += 1
     if frame_counter >= 3:
+        loop_stage.set('send')
+        if config_watcher is not None:
+            # A new plan was built and validated in the background; swap it in between frames
+            update = config_watcher.take_update()
+            if update is not None:
+                screens[0].apply_plan(update[0])
+                output_rate.wake()
+                if update[1]:
+                    pair_colors = update[1]
         # Send the updated image
-        screens[0].send(dat.copy().astype(np.uint8))
+        if renderer is None:
+            to_send = frame_to_send(canvas, output_rate)
+            if to_send is not None:
+                send_start = time.perf_counter()
+                screens[0].send(*to_send)
+                if pacer is not None:
+                    pace_debt += time.perf_counter() - send_start
         frame_counter = 0  # Reset counter
     
     # Update last positions
     last_positions = positions.copy()
     time_dif=time.time()-time_last_update
     if time_dif>time_thresh:
+        loop_stage.set('idle')
         if time_switch==0:
             # Save dat to a timestamped .npz file
             save_dir = "unfiltered_saves"
@@ -171,33 +284,27 @@ while True:
             
             timestamp = time.strftime("%Y%m%d-%H%M%S")
             filename = os.path.join(save_dir, f"display_capture_{timestamp}.npz")
-            np.savez_compressed(filename, display_data=dat)
-            print(f"Display data saved to {filename}")
+            # Compression and the SD write happen on the capture thread
+            capture_writer.submit(filename, dat)
             time_switch=1
 
         current_time = time.time()
-        if current_time - last_load_time > load_image_time:
-            filtered_dir = "filtered_saves"
-            if os.path.exists(filtered_dir):
-                npz_files = [f for f in os.listdir(filtered_dir) if f.endswith('.npz')]
-                if npz_files:
-                    # Choose a random file
-                    random_file = random.choice(npz_files)
-                    file_path = os.path.join(filtered_dir, random_file)
-                    
-                    try:
-                        # Load the display data
-                        loaded_data = np.load(file_path)
-                        if 'display_data' in loaded_data:
-                            dat = loaded_data['display_data']
-                            print(f"Loaded display data from {file_path}")
-                        else:
-                            print(f"No display_data array found in {file_path}")
-                    except Exception as e:
-                        print(f"Error loading file {file_path}: {e}")
-                    
-                    # Update the last load time
-                    last_load_time = current_time
+        if idle_mode == "replay":
+            # Frames come straight out of the memory-mapped recording
+            if renderer is None:
+                canvas.load(replay_player.frame(current_time))
+            else:
+                renderer.load(replay_player.frame(current_time))
+        elif current_time - last_load_time > load_image_time:
+            # Already decoded by the gallery thread, so switching images costs nothing here
+            frame = gallery.next_frame()
+            if frame is not None:
+                if renderer is None:
+                    canvas.load(frame)
+                else:
+                    renderer.load(frame)
+                # Update the last load time
+                last_load_time = current_time
 
         if (time_dif-time_thresh-time_switch*9>0) and (time_thresh<1000):
             time_switch+=1
@@ -205,4 +312,14 @@ while True:
 
         
 
-        dat = dat * decay_rate
\ No newline at end of file
+        if idle_mode != "replay":
+            if renderer is None:
+                canvas.decay(decay_rate)
+            else:
+                tile_decay = True
+
+    loop_stage.set('save')
+    if stroke_log is not None:
+        stroke_log.write(positions, buttons, time_dif > time_thresh and idle_mode != "replay")
+
+    canvas_state.save(dat, positions, buttons, time_thresh, time_switch, time_dif)
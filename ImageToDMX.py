@@ -1,30 +1,78 @@
 import numpy as np
 from sacn import sACNsender
 import math
+import time
+
+# Seconds between repeats of an unchanged universe when pacing (E1.31 receivers time out after 2.5s)
+KEEPALIVE_INTERVAL = 1.0
+
 class SACNPixelSender:
-    def __init__(self, receivers,start_universe=1):
+    def __init__(self, receivers,start_universe=1, sender=None, pacer=None):
         """
         Initialize the SACNPixelSender with receiver configurations.
         :param receivers: List of dicts, each with 'ip', 'pixel_count', and 'addressing_array' keys.
+                          An optional 'universe' key fixes the receiver's first universe.
+        :param sender: sACNsender-compatible object to send with (default: a new sACNsender)
+        :param pacer: Optional UniversePacer (universe_pacing.py) to spread each frame's universes
+                      over part of the frame interval instead of sending them in one burst
         """
-        self.receivers = receivers
-        self.sender = sACNsender()
+        self.start_universe = start_universe
+        self.sender = sender if sender is not None else sACNsender()
+        self.pacer = pacer
+        # Universe -> time it was last flushed, when pacing
+        self.flushed = {}
+        if pacer is not None:
+            # Universes only go out when flushed, one at a time at their paced slot
+            self.sender.manual_flush = True
         self.sender.start()
+        self.receivers = []
+        self.receiver_universes = []
+        self.apply_plan(receivers)
 
+    def apply_plan(self, receivers):
+        """
+        Switch to a new set of receivers without restarting the sender. Universes
+        that stay in use keep running; only added ones are activated and removed
+        ones deactivated, so the display does not go dark.
+        :param receivers: List of receiver dicts, as for __init__.
+        """
         # Set up universes for each receiver
-        self.receiver_universes = []
-        universe_counter = start_universe
+        receiver_universes = []
+        universe_counter = self.start_universe
         for receiver in receivers:
+            universe_counter = receiver.get('universe', universe_counter)
             universe_count = math.ceil(receiver['pixel_count'] / 170)
-            receiver_universes = list(range(universe_counter, universe_counter + universe_count))
-            self.receiver_universes.append(receiver_universes)
+            receiver_universes.append(list(range(universe_counter, universe_counter + universe_count)))
             universe_counter += universe_count
 
-            # Activate universes for this receiver
-            for universe in receiver_universes:
-                self.sender.activate_output(universe)
+        old_universes = {u for universes in self.receiver_universes for u in universes}
+        new_universes = {u for universes in receiver_universes for u in universes}
+        for universe in old_universes - new_universes:
+            self.sender.deactivate_output(universe)
+
+        # Activate universes for each receiver
+        for receiver, universes in zip(receivers, receiver_universes):
+            for universe in universes:
+                if universe not in old_universes:
+                    self.sender.activate_output(universe)
                 self.sender[universe].destination = receiver['ip']
 
+        self.receivers = receivers
+        self.receiver_universes = receiver_universes
+        self._coords_shape = None
+        # New universes start zeroed and changed ones hold the old mapping's pixels,
+        # so the next send fills every universe whatever the dirty area
+        self.resend_all = True
+
+    @classmethod
+    def from_plan(cls, plan_path):
+        """
+        Create a sender from a plan compiled by receiver_config.py, with one
+        receiver entry per controller output starting at its assigned universe.
+        """
+        from receiver_config import load_plan
+        return cls(load_plan(plan_path))
+
     def create_mask(self, height, width):
         """
         Creates a binary mask showing which pixels are mapped by receivers.
@@ -45,28 +93,88 @@ class SACNPixelSender:
             
         return mask
 
-    def send(self, source_array):
+    def send(self, source_array, dirty=None):
         """
         Send pixel data to all configured receivers based on their addressing arrays.
         :param source_array: numpy array of shape (width, height, 3) containing source pixel data.
+        :param dirty: Optional list of (row_start, row_end, col_start, col_end) rectangles that
+                      changed since the last send; only universes with pixels in them are updated.
         """
         height, width, _ = source_array.shape
-        
-        for receiver, universes in zip(self.receivers, self.receiver_universes):
-            # Vectorized extraction of pixel data
-            x_coords = np.clip(receiver['addressing_array'][:, 0], 0, height - 1)
-            y_coords = np.clip(receiver['addressing_array'][:, 1], 0, width - 1)
-            receiver_data = source_array[x_coords, y_coords]
+        coords = self._clipped_coords(height, width)
+        if self.resend_all:
+            dirty = None
+            self.resend_all = False
+        dirty_universes = None if dirty is None else self.universes_in(dirty, height, width)
 
+        updated = []
+        for receiver, universes, (x_coords, y_coords) in zip(self.receivers, self.receiver_universes, coords):
             # Send data in 170-pixel chunks
             for i, universe in enumerate(universes):
+                if dirty_universes is not None and universe not in dirty_universes:
+                    continue
                 start = i * 170
                 end = min(start + 170, receiver['pixel_count'])
-                universe_data = receiver_data[start:end].flatten()
+                # Vectorized extraction of pixel data
+                universe_data = source_array[x_coords[start:end], y_coords[start:end]].flatten()
                 # Pad the last universe if necessary
                 if universe_data.size < 510:
                     universe_data = np.pad(universe_data, (0, 510 - universe_data.size), 'constant')
                 self.sender[universe].dmx_data = universe_data.tobytes()
+                updated.append(universe)
+
+        if self.pacer is not None:
+            # With manual_flush the sender sends no keepalives of its own, so universes
+            # outside the dirty area are repeated here before the controller times them out
+            now = time.monotonic()
+            updated_set = set(updated)
+            for universes in self.receiver_universes:
+                for universe in universes:
+                    if universe not in updated_set and now - self.flushed.get(universe, 0.0) >= KEEPALIVE_INTERVAL:
+                        updated.append(universe)
+            for universe in self.pacer.pace(updated):
+                self.sender.flush([universe])
+                self.flushed[universe] = now
+
+    def _clipped_coords(self, height, width):
+        """Addressing arrays clipped to the source size, worked out once per size and plan"""
+        if self._coords_shape != (height, width):
+            self._coords = [(np.clip(receiver['addressing_array'][:, 0], 0, height - 1),
+                             np.clip(receiver['addressing_array'][:, 1], 0, width - 1))
+                            for receiver in self.receivers]
+            self._universe_map = None
+            self._coords_shape = (height, width)
+        return self._coords
+
+    def universes_in(self, rects, height, width):
+        """
+        Set of universes with at least one pixel inside any of the rectangles.
+        A pixel addressed by several universes (mirrored or duplicated runs) counts for all of them.
+        """
+        coords = self._clipped_coords(height, width)
+        if self._universe_map is None:
+            rows = np.concatenate([x_coords for x_coords, _ in coords])
+            cols = np.concatenate([y_coords for _, y_coords in coords])
+            pixel_universes = np.concatenate([np.repeat(universes, 170)[:len(x_coords)]
+                                              for (x_coords, _), universes in zip(coords, self.receiver_universes)])
+            # Most pixels belong to one universe: keep the first in a map, the rest in a short list
+            flat = rows * width + cols
+            _, first = np.unique(flat, return_index=True)
+            universe_map = np.full((height, width), -1, dtype=np.int32)
+            universe_map[rows[first], cols[first]] = pixel_universes[first]
+            again = np.ones(len(flat), dtype=bool)
+            again[first] = False
+            self._universe_map = universe_map
+            self._repeated = (rows[again], cols[again], pixel_universes[again])
+        found = set()
+        rep_rows, rep_cols, rep_universes = self._repeated
+        for r0, r1, c0, c1 in rects:
+            found.update(np.unique(self._universe_map[r0:r1, c0:c1]).tolist())
+            if len(rep_rows):
+                inside = (rep_rows >= r0) & (rep_rows < r1) & (rep_cols >= c0) & (rep_cols < c1)
+                found.update(np.unique(rep_universes[inside]).tolist())
+        found.discard(-1)
+        return found
 
     def close(self):
         """
@@ -131,7 +239,14 @@ def generate_frame_data():
     return np.random.randint(0, 256, size=(height, width, 3), dtype=np.uint8)
 
 def make_indicesHS(filename):
-    in_list=np.loadtxt(filename, delimiter=',').tolist()
+    return indices_from_layout(np.loadtxt(filename, delimiter=',', ndmin=2))
+
+def indices_from_layout(lines):
+    """
+    Pixel coordinates for layout lines of [row, start column, length], where a
+    negative length runs right to left (the format of layout.txt).
+    """
+    in_list = np.asarray(lines).tolist()
     indices = []
     for sublist in in_list:       
         if sublist[2]>0:
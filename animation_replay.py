@@ -0,0 +1,310 @@
+import os
+import struct
+import time
+import numpy as np
+from brush import stamp_spot
+
+# Frame files (.fsa) are a fixed 32-byte header followed by raw uint8 frames of
+# shape (rows, cols, 3), back to back, so frame N lives at a computable offset
+# and can be memory-mapped without reading the rest of the file.
+FRAME_MAGIC = b'FSAN'
+FRAME_HEADER = struct.Struct('<4sHHHHfQ8x')  # magic, version, rows, cols, channels, fps, frame count
+
+# Stroke logs (.fsl) record what the knobs did each frame instead of the pixels.
+# Re-simulating them through the brush reproduces the drawing at a fraction of the size.
+STROKE_MAGIC = b'FSSL'
+STROKE_HEADER = struct.Struct('<4sHHHHfQ8x')  # magic, version, rows, cols, encoders, fps, record count
+
+FORMAT_VERSION = 1
+
+
+def stroke_dtype(encoder_count):
+    """
+    Record layout of a stroke log: frame time, encoder positions, button states
+    and whether the fade was running on that frame.
+    """
+    return np.dtype([
+        ('t', '<f8'),
+        ('positions', '<i2', (encoder_count,)),
+        ('buttons', '<u1', (encoder_count,)),
+        ('decay', '<u1'),
+    ])
+
+
+class AnimationWriter:
+    def __init__(self, path, rows, cols, fps=40.0):
+        """
+        Append-only writer for frame files.
+
+        :param path: Output .fsa path
+        :param rows: Canvas rows (first axis of dat)
+        :param cols: Canvas columns (second axis of dat)
+        :param fps: Nominal frame rate the frames were captured at
+        """
+        self.path = path
+        self.rows = rows
+        self.cols = cols
+        self.fps = fps
+        self.frame_count = 0
+        self.file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(FRAME_HEADER.pack(FRAME_MAGIC, FORMAT_VERSION, self.rows, self.cols, 3,
+                                          self.fps, self.frame_count))
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, frame):
+        """
+        Append one frame. Floating point canvases (as produced by the fade) are
+        converted to uint8 on the way out.
+        """
+        if frame.shape != (self.rows, self.cols, 3):
+            raise ValueError(f"Frame shape {frame.shape} does not match {(self.rows, self.cols, 3)}")
+        self.file.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+        self.frame_count += 1
+
+    def close(self):
+        """
+        Patch the frame count into the header and close the file.
+        """
+        self._write_header()
+        self.file.close()
+
+
+class AnimationPlayer:
+    def __init__(self, path, speed=1.0, loop=True):
+        """
+        Stream frames out of a frame file through a read-only memory map. Only
+        the pages of the frames actually shown are touched, so memory stays
+        bounded no matter how long the recording is.
+
+        :param path: .fsa file written by AnimationWriter
+        :param speed: Playback speed multiplier (1.0 = recorded rate)
+        :param loop: Wrap around at the end instead of holding the last frame
+        """
+        with open(path, 'rb') as f:
+            magic, version, rows, cols, channels, fps, _ = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+        if magic != FRAME_MAGIC:
+            raise ValueError(f"{path} is not a frame file")
+
+        frame_size = rows * cols * channels
+        # Count frames from the file size so recordings that were never closed still play
+        frame_count = (os.path.getsize(path) - FRAME_HEADER.size) // frame_size
+        if frame_count <= 0:
+            raise ValueError(f"{path} contains no frames")
+
+        self.path = path
+        self.fps = fps
+        self.frame_count = frame_count
+        self.frames = np.memmap(path, dtype=np.uint8, mode='r', offset=FRAME_HEADER.size,
+                                shape=(frame_count, rows, cols, channels))
+        self.speed = speed
+        self.loop = loop
+        self.position = 0.0  # in frames
+        self.last_time = None
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps
+
+    @property
+    def finished(self):
+        return not self.loop and self.position >= self.frame_count - 1
+
+    def set_speed(self, speed):
+        self.speed = speed
+
+    def seek(self, seconds):
+        """
+        Jump to a time in the recording (wrapped when looping, clamped otherwise).
+        """
+        self.position = self._wrap(seconds * self.fps)
+
+    def _wrap(self, position):
+        if self.loop:
+            return position % self.frame_count
+        return min(max(position, 0.0), self.frame_count - 1)
+
+    def frame(self, now=None):
+        """
+        Advance the play head by the wall time since the last call and return the
+        frame under it. The result is a read-only view into the map; copy it if
+        it is going to be drawn on.
+        """
+        now = time.time() if now is None else now
+        if self.last_time is not None:
+            self.position = self._wrap(self.position + (now - self.last_time) * self.fps * self.speed)
+        self.last_time = now
+        return self.frames[int(self.position)]
+
+    def close(self):
+        # Dropping the map lets numpy unmap the file
+        self.frames = None
+
+
+class StrokeLogWriter:
+    def __init__(self, path, rows, cols, encoder_count, fps=40.0):
+        """
+        Append-only writer for stroke logs.
+
+        :param path: Output .fsl path
+        :param rows: Canvas rows the strokes were drawn on
+        :param cols: Canvas columns the strokes were drawn on
+        :param encoder_count: Number of encoders (and buttons) recorded per frame
+        :param fps: Nominal frame rate of the render loop
+        """
+        self.path = path
+        self.rows = rows
+        self.cols = cols
+        self.encoder_count = encoder_count
+        self.fps = fps
+        self.dtype = stroke_dtype(encoder_count)
+        self.record_count = 0
+        self.start_time = None
+        self.file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(STROKE_HEADER.pack(STROKE_MAGIC, FORMAT_VERSION, self.rows, self.cols,
+                                           self.encoder_count, self.fps, self.record_count))
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, positions, buttons, decay, now=None):
+        """
+        Append the input state of one rendered frame.
+        """
+        now = time.time() if now is None else now
+        if self.start_time is None:
+            self.start_time = now
+        record = np.zeros(1, dtype=self.dtype)
+        record['t'] = now - self.start_time
+        record['positions'] = positions[:self.encoder_count]
+        buttons = buttons[:self.encoder_count]
+        record['buttons'][0, :len(buttons)] = buttons
+        record['decay'] = 1 if decay else 0
+        self.file.write(record.tobytes())
+        self.record_count += 1
+
+    def close(self):
+        self._write_header()
+        self.file.close()
+
+
+class StrokeLogPlayer:
+    def __init__(self, path, pair_colors, decay_rate=0.995, speed=1.0, loop=True):
+        """
+        Replay a stroke log by re-running the brush and fade on a private canvas.
+        Records are read through a memory map, so only the canvas itself is held
+        in memory.
+
+        :param path: .fsl file written by StrokeLogWriter
+        :param pair_colors: Colour table indexed by the colour button, as in FS.py
+        :param decay_rate: Fade multiplier applied on frames recorded with the fade running
+        :param speed: Playback speed multiplier
+        :param loop: Start over at the end instead of holding the last frame
+        """
+        with open(path, 'rb') as f:
+            magic, version, rows, cols, encoders, fps, _ = STROKE_HEADER.unpack(f.read(STROKE_HEADER.size))
+        if magic != STROKE_MAGIC:
+            raise ValueError(f"{path} is not a stroke log")
+
+        dtype = stroke_dtype(encoders)
+        record_count = (os.path.getsize(path) - STROKE_HEADER.size) // dtype.itemsize
+        if record_count <= 0:
+            raise ValueError(f"{path} contains no records")
+
+        self.path = path
+        self.fps = fps
+        self.records = np.memmap(path, dtype=dtype, mode='r', offset=STROKE_HEADER.size,
+                                 shape=(record_count,))
+        self.record_count = record_count
+        self.pair_colors = pair_colors
+        self.decay_rate = decay_rate
+        self.speed = speed
+        self.loop = loop
+        self.canvas = np.zeros((rows, cols, 3))
+        self.next_record = 0
+        self.play_time = 0.0
+        self.last_time = None
+
+    @property
+    def duration(self):
+        return float(self.records[-1]['t'])
+
+    @property
+    def finished(self):
+        return not self.loop and self.next_record >= self.record_count
+
+    def set_speed(self, speed):
+        self.speed = speed
+
+    def seek(self, seconds):
+        """
+        Jump to a time in the log. Going backwards re-simulates from the start,
+        since the canvas at any moment depends on every stroke before it.
+        """
+        if self.loop:
+            seconds = seconds % self.duration if self.duration > 0 else 0.0
+        else:
+            seconds = min(max(seconds, 0.0), self.duration)
+        if seconds < self.play_time:
+            self._restart()
+        self._advance_to(seconds)
+
+    def _restart(self):
+        self.canvas[:] = 0
+        self.next_record = 0
+        self.play_time = 0.0
+
+    def _apply(self, record):
+        positions = record['positions']
+        buttons = record['buttons']
+        for i in range(len(positions) // 2):
+            stamp_spot(self.canvas, int(positions[i*2]), int(positions[i*2+1]),
+                       int(buttons[i*2]), self.pair_colors[int(buttons[i*2+1]) % len(self.pair_colors)])
+        if record['decay']:
+            self.canvas *= self.decay_rate
+
+    def _advance_to(self, seconds):
+        # Find the records due by this time in one search, then replay them in order
+        pending = self.records['t'][self.next_record:]
+        end = self.next_record + int(np.searchsorted(pending, seconds, side='right'))
+        for index in range(self.next_record, end):
+            self._apply(self.records[index])
+        self.next_record = max(self.next_record, end)
+        self.play_time = seconds
+
+    def frame(self, now=None):
+        """
+        Advance by the wall time since the last call and return the re-simulated
+        canvas. The returned array is the player's own canvas; copy it before
+        drawing on it.
+        """
+        now = time.time() if now is None else now
+        if self.last_time is not None:
+            target = self.play_time + (now - self.last_time) * self.speed
+            if target > self.duration:
+                if self.loop:
+                    self._restart()
+                    target = target % self.duration if self.duration > 0 else 0.0
+                else:
+                    target = self.duration
+            self._advance_to(target)
+        self.last_time = now
+        return self.canvas
+
+    def close(self):
+        self.records = None
+
+
+def open_player(path, pair_colors=None, **kwargs):
+    """
+    Open a frame file or a stroke log based on its extension.
+    """
+    if path.endswith('.fsl'):
+        return StrokeLogPlayer(path, pair_colors, **kwargs)
+    kwargs.pop('decay_rate', None)
+    return AnimationPlayer(path, **kwargs)
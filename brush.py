@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def stamp_spot(dat, x, y, size, color):
+    """
+    Stamp a round, soft-edged spot onto the canvas, keeping the brighter of the
+    existing and new value in each channel.
+
+    :param dat: numpy array of shape (rows, cols, 3), modified in place
+    :param x: row index of the spot centre (first axis of dat)
+    :param y: column index of the spot centre (second axis of dat)
+    :param size: brush size from the button state (0-5)
+    :param color: RGB triple
+    :return: (x_min, x_max, y_min, y_max) inclusive bounds that were touched, or None
+    """
+    # Calculate radius based on size value (0-4)
+    radius = int(0.5 + size * 0.75)  # Size 0 = radius 0, Size 4 = radius 2
+
+    # Create coordinates for all pixels within radius
+    y_indices, x_indices = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+    # Calculate distance from center for each pixel
+    distances = np.sqrt(x_indices**2 + y_indices**2)
+
+    # Calculate intensity falloff (1.0 at center, decreasing outward)
+    intensity = np.clip(1.0 - distances / max(0.5 + size * 0.75, 1), 0, 1)**2
+
+    # Calculate bounds for the spot
+    y_min = max(0, y - radius)
+    y_max = min(dat.shape[1] - 1, y + radius)
+    x_min = max(0, x - radius)
+    x_max = min(dat.shape[0] - 1, x + radius)
+
+    # Make sure we have valid ranges before proceeding
+    if y_min > y_max or x_min > x_max:
+        return None
+
+    # Adjust distances/intensities to match array bounds
+    y_offset = y_min - (y - radius)
+    x_offset = x_min - (x - radius)
+    sub_intensity = intensity[y_offset:y_offset + (y_max - y_min + 1),
+                              x_offset:x_offset + (x_max - x_min + 1)]
+
+    # Get the intensity matrix properly shaped for broadcasting
+    intensity_matrix = sub_intensity.T[:, :, np.newaxis]
+    new_values = (intensity_matrix * np.asarray(color, dtype=float)).astype(np.uint8)
+
+    # Update with maximum values
+    region = dat[x_min:x_max + 1, y_min:y_max + 1]
+    np.maximum(region, new_values, out=region, casting='unsafe')
+    return x_min, x_max, y_min, y_max
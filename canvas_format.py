@@ -0,0 +1,139 @@
+import argparse
+import glob
+import os
+import struct
+import time
+import zlib
+import numpy as np
+
+# .fsc canvas file: a fixed 32-byte header followed by the raw RGB payload in
+# row-major (rows, cols, 3) uint8 order, optionally zlib-compressed.
+CANVAS_MAGIC = b'FSCV'
+CANVAS_VERSION = 1
+CANVAS_HEADER = struct.Struct('<4sHHHHdI8x')  # magic, version, flags, rows, cols, timestamp, payload length
+FLAG_ZLIB = 0x1
+
+
+def encode_canvas(canvas, compress=False, timestamp=None):
+    """
+    Pack a canvas into the .fsc byte layout.
+
+    :param canvas: Array-like of shape (rows, cols, 3); values are clipped to 0-255
+    :param compress: zlib-compress the payload (level 1, cheap enough for the BeagleBone)
+    :param timestamp: Capture time in seconds since the epoch (defaults to now)
+    :return: bytes holding header and payload
+    """
+    canvas = np.asarray(canvas)
+    if canvas.ndim != 3 or canvas.shape[2] != 3:
+        raise ValueError(f"Expected a (rows, cols, 3) canvas, got shape {canvas.shape}")
+    if canvas.dtype != np.uint8:
+        canvas = np.clip(canvas, 0, 255).astype(np.uint8)
+    payload = np.ascontiguousarray(canvas).data.cast('B')
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= FLAG_ZLIB
+    header = CANVAS_HEADER.pack(CANVAS_MAGIC, CANVAS_VERSION, flags, canvas.shape[0], canvas.shape[1],
+                                time.time() if timestamp is None else timestamp, len(payload))
+    return header + payload
+
+
+def decode_canvas(data):
+    """
+    Unpack .fsc bytes.
+
+    :return: (canvas, timestamp) with canvas a (rows, cols, 3) uint8 array
+    """
+    magic, version, flags, rows, cols, timestamp, length = CANVAS_HEADER.unpack_from(data)
+    if magic != CANVAS_MAGIC:
+        raise ValueError("Not a canvas file")
+    if version > CANVAS_VERSION:
+        raise ValueError(f"Unsupported canvas file version {version}")
+    payload = memoryview(data)[CANVAS_HEADER.size:CANVAS_HEADER.size + length]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    canvas = np.frombuffer(payload, dtype=np.uint8).reshape(rows, cols, 3)
+    return canvas, timestamp
+
+
+def write_canvas(file, canvas, compress=False):
+    """
+    Write a canvas to an open binary file with a single write call. Matches the
+    encoder signature CaptureWriter expects.
+    """
+    file.write(encode_canvas(canvas, compress))
+
+
+def write_canvas_compressed(file, canvas):
+    write_canvas(file, canvas, compress=True)
+
+
+def save_canvas(path, canvas, compress=False, timestamp=None):
+    with open(path, 'wb') as file:
+        file.write(encode_canvas(canvas, compress, timestamp))
+
+
+def load_canvas(path):
+    """
+    Read an .fsc file.
+
+    :return: (canvas, timestamp)
+    """
+    with open(path, 'rb') as file:
+        return decode_canvas(file.read())
+
+
+def load_capture(path):
+    """
+    Load the display array from either an FS.py .npz capture or an .fsc canvas
+    file. Returns None if the file holds no display data.
+    """
+    if path.endswith('.fsc'):
+        return load_canvas(path)[0]
+    with np.load(path) as data:
+        if 'display_data' not in data:
+            return None
+        return data['display_data']
+
+
+def read_matrix_csv(path):
+    """
+    Parse a legacy drawing_*.csv written by save_matrix_to_sd ("r:g:b" cells).
+    """
+    with open(path) as file:
+        rows = [line.strip().split(',') for line in file if line.strip()]
+    values = [[int(v) for cell in row for v in cell.split(':')] for row in rows]
+    return np.array(values, dtype=np.uint8).reshape(len(rows), -1, 3)
+
+
+def convert_csv_files(directory, compress=False, remove=False):
+    """
+    Convert every drawing_*.csv in a directory into an .fsc next to it, keeping
+    the capture time from the file's modification time.
+
+    :return: Number of files converted
+    """
+    converted = 0
+    for csv_path in sorted(glob.glob(os.path.join(directory, 'drawing_*.csv'))):
+        fsc_path = os.path.splitext(csv_path)[0] + '.fsc'
+        try:
+            canvas = read_matrix_csv(csv_path)
+            save_canvas(fsc_path, canvas, compress, timestamp=os.path.getmtime(csv_path))
+        except Exception as e:
+            print(f"Error converting {csv_path}: {e}")
+            continue
+        if remove:
+            os.remove(csv_path)
+        converted += 1
+        print(f"Converted {csv_path} -> {fsc_path}")
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert drawing_*.csv saves to .fsc canvas files")
+    parser.add_argument("directory", nargs="?", default="/media/mmcblk0p1")
+    parser.add_argument("--compress", action="store_true", help="zlib-compress the payload")
+    parser.add_argument("--remove", action="store_true", help="delete each CSV after converting it")
+    args = parser.parse_args()
+    count = convert_csv_files(args.directory, args.compress, args.remove)
+    print(f"Converted {count} files.")
@@ -0,0 +1,108 @@
+import os
+import time
+import numpy as np
+
+STATE_MAGIC = b'FSRS'
+STATE_VERSION = 1
+
+
+def state_dtype(rows, cols, encoder_count):
+    """
+    One record holding everything needed to resume drawing. The file is this
+    record, memory-mapped, so saving is a plain copy into the page cache.
+    """
+    return np.dtype([
+        ('magic', 'S4'), ('version', '<u2'), ('rows', '<u2'), ('cols', '<u2'), ('encoder_count', '<u2'),
+        ('saved', '<f8'),            # wall clock time of the last save
+        ('time_thresh', '<f8'),      # idle threshold, which adapts to how busy the sculpture is
+        ('time_switch', '<f8'),
+        ('idle', '<f8'),             # seconds since the knobs last moved, at the last save
+        ('positions', '<i4', (encoder_count,)),
+        ('buttons', '<i4', (encoder_count,)),
+        ('canvas', '<f4', (rows, cols, 3)),
+    ])
+
+
+class CanvasState:
+    def __init__(self, path, shape, encoder_count, flush_interval=10.0):
+        """
+        Live canvas and render state backed by a memory-mapped file, so a restart
+        (crash, update, power blip) resumes the drawing instead of starting black.
+
+        Put the file on tmpfs (/dev/shm) to survive process restarts only, or on
+        the SD card to survive power loss as well; flush_interval bounds how much
+        is lost and how often the card is written.
+
+        :param path: State file
+        :param shape: Canvas shape (rows, cols, 3)
+        :param encoder_count: Number of encoder positions saved
+        :param flush_interval: Seconds between msyncs of the mapped file
+        """
+        rows, cols, _ = shape
+        self.path = path
+        self.flush_interval = flush_interval
+        self.last_flush = time.time()
+        dtype = state_dtype(rows, cols, encoder_count)
+        self.restored = False
+        if os.path.exists(path) and os.path.getsize(path) == dtype.itemsize:
+            self.map = np.memmap(path, dtype=dtype, mode='r+', shape=(1,))
+            header = self.map[0]
+            self.restored = (header['magic'] == STATE_MAGIC and header['version'] == STATE_VERSION
+                             and header['rows'] == rows and header['cols'] == cols
+                             and header['encoder_count'] == encoder_count)
+        else:
+            self.map = np.memmap(path, dtype=dtype, mode='w+', shape=(1,))
+        if not self.restored:
+            # Missing, from another canvas size, or from an older version: start fresh
+            self.map[0] = np.zeros((), dtype=dtype)
+            self.map['magic'] = STATE_MAGIC
+            self.map['version'] = STATE_VERSION
+            self.map['rows'] = rows
+            self.map['cols'] = cols
+            self.map['encoder_count'] = encoder_count
+            self.map.flush()
+
+    @property
+    def canvas(self):
+        """The saved canvas, as a view into the mapped file"""
+        return self.map['canvas'][0]
+
+    def load(self):
+        """
+        :return: Dict of the saved render state (copies, not views)
+        """
+        return {
+            'saved': float(self.map['saved'][0]),
+            'time_thresh': float(self.map['time_thresh'][0]),
+            'time_switch': float(self.map['time_switch'][0]),
+            'idle': float(self.map['idle'][0]),
+            'positions': np.array(self.map['positions'][0]),
+            'buttons': np.array(self.map['buttons'][0]),
+            'canvas': np.array(self.map['canvas'][0], dtype=float),
+        }
+
+    def save(self, canvas, positions, buttons, time_thresh, time_switch, idle, now=None):
+        """
+        Copy the current state into the mapped file; flushes to disk every flush_interval.
+        Cheap enough to call every frame.
+        """
+        now = time.time() if now is None else now
+        np.copyto(self.map['canvas'][0], canvas, casting='unsafe')
+        n = min(len(positions), self.map['positions'].shape[1])
+        self.map['positions'][0, :n] = positions[:n]
+        n = min(len(buttons), self.map['buttons'].shape[1])
+        self.map['buttons'][0, :n] = buttons[:n]
+        self.map['time_thresh'] = time_thresh
+        self.map['time_switch'] = time_switch
+        self.map['idle'] = idle
+        self.map['saved'] = now
+        if now - self.last_flush >= self.flush_interval:
+            self.flush()
+            self.last_flush = now
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.map = None
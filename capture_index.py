@@ -0,0 +1,178 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import numpy as np
+from canvas_format import load_capture
+
+INDEX_FILE = "capture_index.sqlite"
+
+# A capture is blank when nothing in it is brighter than this...
+BLANK_MAX = 24
+# ...or when fewer than this fraction of its pixels are lit
+BLANK_LIT_FRACTION = 0.002
+LIT_LEVEL = 16
+# Captures whose hashes differ in at most this many bits from the previous one are duplicates
+DUPLICATE_DISTANCE = 4
+# and only if their overall brightness is this close too
+DUPLICATE_MEAN_DIFF = 4.0
+# Cells must differ by more than this to set a hash bit, so flat dark areas hash stably
+HASH_MARGIN = 2.0
+
+
+def perceptual_hash(img_data):
+    """
+    64-bit difference hash: the image is averaged down to 8x9 grey cells and
+    each bit records whether a cell is clearly brighter than its right-hand neighbour.
+    """
+    gray = np.asarray(img_data, dtype=float).mean(axis=2)
+    row_starts = np.linspace(0, gray.shape[0], 9).astype(int)[:-1]
+    col_starts = np.linspace(0, gray.shape[1], 10).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(gray, row_starts, axis=0), col_starts, axis=1)
+    counts = np.outer(np.diff(np.append(row_starts, gray.shape[0])), np.diff(np.append(col_starts, gray.shape[1])))
+    cells = sums / counts
+    bits = (cells[:, :-1] > cells[:, 1:] + HASH_MARGIN).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def compute_signature(img_data):
+    """
+    Returns (hash, mean brightness, max brightness, lit fraction) for a capture.
+    """
+    img = np.clip(np.asarray(img_data, dtype=float), 0, 255)
+    brightness = img.max(axis=2)
+    return (perceptual_hash(img), float(brightness.mean()), float(brightness.max()),
+            float((brightness > LIT_LEVEL).mean()))
+
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+class CaptureIndex:
+    def __init__(self, db_path=INDEX_FILE):
+        """
+        Sidecar database of capture signatures keyed by file name, size and mtime,
+        so each capture is decoded and hashed only once.
+
+        :param db_path: Path of the SQLite file
+        """
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS captures (
+            name TEXT PRIMARY KEY, mtime REAL, size INTEGER,
+            hash INTEGER, mean REAL, max REAL, lit REAL)""")
+        # The whole table is small enough to keep in memory for the session
+        self.entries = {row[0]: row[1:] for row in self.db.execute("SELECT * FROM captures")}
+        self.pending = []
+
+    def lookup(self, name, mtime, size):
+        """Returns the cached signature, or None if missing or the file changed"""
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != mtime or entry[1] != size:
+            return None
+        hash_value = entry[2] & 0xFFFFFFFFFFFFFFFF
+        return (hash_value,) + tuple(entry[3:])
+
+    def store(self, name, mtime, size, signature):
+        # SQLite integers are signed 64-bit
+        hash_value = signature[0] - (1 << 64) if signature[0] >= (1 << 63) else signature[0]
+        entry = (mtime, size, hash_value) + tuple(signature[1:])
+        self.entries[name] = entry
+        self.pending.append((name,) + entry)
+
+    def signature(self, path, name=None):
+        """
+        Signature of a local capture, from the cache when the file is unchanged.
+        Returns None if the file holds no display data.
+        """
+        stat = os.stat(path)
+        name = name or os.path.basename(path)
+        signature = self.lookup(name, stat.st_mtime, stat.st_size)
+        if signature is None:
+            img_data = load_capture(path)
+            if img_data is None:
+                return None
+            signature = compute_signature(img_data)
+            self.store(name, stat.st_mtime, stat.st_size, signature)
+        return signature
+
+    def commit(self):
+        if self.pending:
+            self.db.executemany("INSERT OR REPLACE INTO captures VALUES (?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.db.commit()
+            self.pending = []
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+class CaptureClassifier:
+    def __init__(self, blank_max=BLANK_MAX, blank_lit_fraction=BLANK_LIT_FRACTION,
+                 duplicate_distance=DUPLICATE_DISTANCE, duplicate_mean_diff=DUPLICATE_MEAN_DIFF):
+        """
+        Decides, in capture order, whether each capture is blank, a duplicate of
+        the previous non-blank capture, or worth a human look.
+        """
+        self.blank_max = blank_max
+        self.blank_lit_fraction = blank_lit_fraction
+        self.duplicate_distance = duplicate_distance
+        self.duplicate_mean_diff = duplicate_mean_diff
+        self.previous = None
+
+    def classify(self, signature):
+        """
+        :return: 'blank', 'duplicate' or None (needs review)
+        """
+        hash_value, mean, maximum, lit = signature
+        if maximum < self.blank_max or lit < self.blank_lit_fraction:
+            return 'blank'
+        previous = self.previous
+        self.previous = signature
+        if (previous is not None and hamming(hash_value, previous[0]) <= self.duplicate_distance
+                and abs(mean - previous[1]) <= self.duplicate_mean_diff):
+            return 'duplicate'
+        return None
+
+
+def auto_reject(unfiltered_dir="unfiltered_saves", rejected_dir="rejected_saves", index_path=None):
+    """
+    Move blank and duplicate captures from unfiltered_dir to rejected_dir.
+
+    :return: Sorted names of the captures left for human review
+    """
+    os.makedirs(rejected_dir, exist_ok=True)
+    index = CaptureIndex(index_path or os.path.join(os.path.dirname(os.path.abspath(unfiltered_dir)), INDEX_FILE))
+    classifier = CaptureClassifier()
+    # Capture names carry their timestamp, so name order is capture order
+    names = sorted(f for f in os.listdir(unfiltered_dir) if f.endswith(('.npz', '.fsc')))
+    remaining = []
+    counts = {'blank': 0, 'duplicate': 0}
+    try:
+        for name in names:
+            path = os.path.join(unfiltered_dir, name)
+            try:
+                signature = index.signature(path)
+            except Exception as e:
+                print(f"Error indexing {name}: {e}")
+                remaining.append(name)
+                continue
+            verdict = classifier.classify(signature) if signature is not None else None
+            if verdict is None:
+                remaining.append(name)
+                continue
+            shutil.move(path, os.path.join(rejected_dir, name))
+            counts[verdict] += 1
+    finally:
+        index.close()
+    print(f"Auto-rejected {counts['blank']} blank and {counts['duplicate']} duplicate captures, "
+          f"{len(remaining)} left for review")
+    return remaining
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move blank and duplicate captures out of unfiltered_saves")
+    parser.add_argument("unfiltered_dir", nargs="?", default="unfiltered_saves")
+    parser.add_argument("rejected_dir", nargs="?", default="rejected_saves")
+    args = parser.parse_args()
+    auto_reject(args.unfiltered_dir, args.rejected_dir)
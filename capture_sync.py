@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import paramiko
+
+CAPTURE_DIRS = ["unfiltered_saves", "filtered_saves", "rejected_saves"]
+MANIFEST_FILE = "manifest.json"
+# Files downloaded at the same time, each over its own SFTP channel on the one SSH connection
+TRANSFER_WORKERS = 4
+# Printed by the remote command for each review decision it could not apply
+FAILED_MARKER = "FAILED:"
+# Files hashed on the device per remote command when verifying downloads
+VERIFY_BATCH = 200
+
+
+class CaptureMirror:
+    def __init__(self, ssh_client, remote_base_path, local_base_path, workers=TRANSFER_WORKERS):
+        """
+        Local mirror of the capture directories on the BeagleBone, kept in step by
+        a manifest of size, mtime and SHA-256 for every mirrored file.
+
+        :param ssh_client: Connected paramiko.SSHClient
+        :param remote_base_path: Directory on the device holding the capture directories
+        :param local_base_path: Local directory holding the mirror and its manifest
+        :param workers: Number of files transferred in parallel
+        """
+        self.ssh_client = ssh_client
+        self.remote_base_path = remote_base_path
+        self.local_base_path = local_base_path
+        self.workers = workers
+        self.manifest_path = os.path.join(local_base_path, MANIFEST_FILE)
+        self.manifest = self._load_manifest()
+        self.local_sftp = threading.local()
+        self.sftp_clients = []
+        self.sftp_lock = threading.Lock()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def _sftp(self):
+        """
+        One SFTP channel per transfer thread, all on the same SSH transport. The
+        connection is shared, but each thread gets its own SFTPClient: paramiko
+        does not promise one client is safe to use from several threads, and
+        separate channels let the per-file prefetches run side by side.
+        """
+        sftp = getattr(self.local_sftp, 'client', None)
+        if sftp is None:
+            sftp = self.ssh_client.open_sftp()
+            self.local_sftp.client = sftp
+            with self.sftp_lock:
+                self.sftp_clients.append(sftp)
+        return sftp
+
+    def _run(self, command):
+        stdin, stdout, stderr = self.ssh_client.exec_command(command)
+        output = stdout.read().decode()
+        error = stderr.read().decode().strip()
+        return output, error
+
+    def list_remote(self):
+        """
+        List every capture directory on the device in one round-trip.
+
+        :return: (expanded base path, {"dir/name": (size, mtime)})
+        """
+        output, error = self._run(
+            f"cd {self.remote_base_path} && mkdir -p {' '.join(CAPTURE_DIRS)} && pwd && "
+            f"find {' '.join(CAPTURE_DIRS)} -maxdepth 1 -type f -printf '%p %s %T@\\n'"
+        )
+        lines = output.strip().split('\n')
+        if not lines or not lines[0]:
+            raise RuntimeError(error or f"{self.remote_base_path} not found")
+        remote = {}
+        for line in lines[1:]:
+            if line.strip():
+                key, size, mtime = line.rsplit(' ', 2)
+                remote[key] = (int(size), float(mtime))
+        return lines[0], remote
+
+    def _local_path(self, key):
+        return os.path.join(self.local_base_path, *key.split('/'))
+
+    def _local_decisions(self, remote):
+        """
+        Captures the manifest has in unfiltered_saves that were moved locally into
+        filtered_saves or rejected_saves by a review of the mirror.
+        """
+        decisions = []
+        for key in self.manifest:
+            directory, name = key.split('/', 1)
+            if directory != "unfiltered_saves" or key not in remote:
+                continue
+            if os.path.exists(self._local_path(key)):
+                continue
+            for dest_dir in ("filtered_saves", "rejected_saves"):
+                if os.path.exists(self._local_path(f"{dest_dir}/{name}")):
+                    decisions.append((key, f"{dest_dir}/{name}"))
+                    break
+        return decisions
+
+    def push_decisions(self, base_path, remote, decisions):
+        """
+        Apply local review decisions on the device with a single remote command.
+
+        :return: Set of source keys whose move failed on the device
+        """
+        if not decisions:
+            return set()
+        command = f"cd {shlex.quote(base_path)} && " + "; ".join(
+            f"mv -- {shlex.quote(source)} {shlex.quote(dest)} || echo {shlex.quote(FAILED_MARKER + source)}"
+            for source, dest in decisions
+        )
+        output, error = self._run(command)
+        failed = {line[len(FAILED_MARKER):] for line in output.split('\n') if line.startswith(FAILED_MARKER)}
+        pushed = 0
+        for source, dest in decisions:
+            if source in failed:
+                print(f"Error moving {source} on device: {error}")
+                continue
+            remote[dest] = remote.pop(source)
+            entry = self.manifest.pop(source, None)
+            if entry is not None:
+                self.manifest[dest] = entry
+            pushed += 1
+        print(f"Pushed {pushed} review decisions to the device")
+        return failed
+
+    def _download(self, base_path, key, size, mtime):
+        """Download one file via a temp file, hashing it on the way, then set its mtime"""
+        local_path = self._local_path(key)
+        temp_path = local_path + ".part"
+        digest = hashlib.sha256()
+        try:
+            with self._sftp().open(f"{base_path}/{key}", 'rb') as remote_file, open(temp_path, 'wb') as local_file:
+                remote_file.prefetch(size)
+                while True:
+                    chunk = remote_file.read(65536)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    local_file.write(chunk)
+        except Exception:
+            # Do not leave a partial file in the mirror
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, local_path)
+        os.utime(local_path, (mtime, mtime))
+        return key, {'size': size, 'mtime': mtime, 'sha256': digest.hexdigest()}
+
+    def verify_downloads(self, base_path, entries):
+        """
+        Check downloaded files against SHA-256 sums computed on the device.
+
+        :param entries: {key: manifest entry} of the files just downloaded
+        :return: Keys whose local copy does not match the device
+        """
+        keys = list(entries)
+        device_sums = {}
+        for i in range(0, len(keys), VERIFY_BATCH):
+            output, error = self._run(f"cd {shlex.quote(base_path)} && sha256sum -- " +
+                                      " ".join(shlex.quote(key) for key in keys[i:i + VERIFY_BATCH]))
+            for line in output.split('\n'):
+                if line.strip():
+                    digest, key = line.split(None, 1)
+                    device_sums[key.lstrip('*')] = digest
+        if keys and not device_sums:
+            print(f"Could not verify downloads on the device: {error}")
+            return []
+        # A file missing from the output changed or vanished on the device since it was listed
+        return [key for key in keys if device_sums.get(key) != entries[key]['sha256']]
+
+    def sync(self):
+        """
+        Bring the mirror up to date with the device and push local decisions back.
+
+        :return: Number of files downloaded
+        """
+        for directory in CAPTURE_DIRS:
+            os.makedirs(os.path.join(self.local_base_path, directory), exist_ok=True)
+
+        base_path, remote = self.list_remote()
+        # A decision that failed to push keeps its manifest entry and is not fetched back into
+        # unfiltered_saves, so the review is still found and pushed again next sync
+        unpushed = self.push_decisions(base_path, remote, self._local_decisions(remote))
+
+        # Index what we already have by (name, size, mtime) so captures that were
+        # moved between directories on the device are moved locally, not fetched again
+        known = {}
+        for key, entry in self.manifest.items():
+            if os.path.exists(self._local_path(key)):
+                known[(key.split('/', 1)[1], entry['size'], entry['mtime'])] = key
+
+        to_download = []
+        moved = 0
+        for key, (size, mtime) in remote.items():
+            if key in unpushed:
+                continue
+            entry = self.manifest.get(key)
+            if entry and entry['size'] == size and entry['mtime'] == mtime and os.path.exists(self._local_path(key)):
+                continue
+            previous_key = known.get((key.split('/', 1)[1], size, mtime))
+            if previous_key and previous_key != key and previous_key not in remote:
+                os.replace(self._local_path(previous_key), self._local_path(key))
+                self.manifest[key] = self.manifest.pop(previous_key)
+                moved += 1
+                continue
+            to_download.append((key, size, mtime))
+
+        # Files the device no longer has (and that we did not just move)
+        removed = 0
+        for key in [key for key in self.manifest if key not in remote]:
+            local_path = self._local_path(key)
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            del self.manifest[key]
+            removed += 1
+
+        fetched = {}
+        if to_download:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._download, base_path, *item) for item in to_download]
+                for future in futures:
+                    try:
+                        key, entry = future.result()
+                    except Exception as e:
+                        print(f"Error downloading: {e}")
+                        continue
+                    fetched[key] = entry
+
+        # Copies that do not match the device are dropped and fetched again next sync
+        for key in self.verify_downloads(base_path, fetched):
+            print(f"Checksum mismatch for {key}, discarding local copy")
+            os.remove(self._local_path(key))
+            del fetched[key]
+        self.manifest.update(fetched)
+        downloaded = len(fetched)
+
+        self._save_manifest()
+        print(f"Sync complete: {downloaded} downloaded, {moved} moved, {removed} removed, "
+              f"{len(remote)} files on device")
+        return downloaded
+
+    def close(self):
+        for sftp in self.sftp_clients:
+            sftp.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mirror the BeagleBone capture directories locally")
+    parser.add_argument("--host", default="192.168.68.50")
+    parser.add_argument("--user", default="debian")
+    parser.add_argument("--password", default="temppwd")
+    parser.add_argument("--remote-path", default="~/FS/FutureSketch")
+    parser.add_argument("--local-path", default="mirror")
+    parser.add_argument("--workers", type=int, default=TRANSFER_WORKERS)
+    args = parser.parse_args()
+
+    os.makedirs(args.local_path, exist_ok=True)
+    ssh_client = paramiko.SSHClient()
+    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    print(f"Connecting to {args.user}@{args.host}...")
+    ssh_client.connect(hostname=args.host, username=args.user, password=args.password)
+    mirror = CaptureMirror(ssh_client, args.remote_path, args.local_path, args.workers)
+    try:
+        mirror.sync()
+    finally:
+        mirror.close()
+        ssh_client.close()
@@ -0,0 +1,137 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+import numpy as np
+
+
+def write_npz(file, data):
+    """
+    Encoder for FS.py captures: compressed .npz with a single display_data array.
+    """
+    np.savez_compressed(file, display_data=data)
+
+
+class CaptureWriter:
+    def __init__(self, max_queue=4, block=False, timeout=None):
+        """
+        Background writer for canvas captures. The render loop hands over a
+        snapshot and returns immediately; compression and the SD card write
+        happen on a worker thread.
+
+        :param max_queue: Number of captures allowed to wait for the worker
+        :param block: When the queue is full, wait for space (backpressure) instead of dropping the capture
+        :param timeout: Longest time to wait for space when blocking (None = wait forever)
+        """
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.block = block
+        self.timeout = timeout
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+        self.running = True
+        self.worker = threading.Thread(target=self._worker_loop)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def submit(self, path, data, encoder=write_npz):
+        """
+        Queue a capture for writing.
+
+        :param path: Final destination of the file
+        :param data: Canvas to save; a copy is taken here so the caller can keep drawing on it
+        :param encoder: Function (file, snapshot) that writes the snapshot to an open binary file
+        :return: True if queued, False if dropped because the queue was full
+        """
+        snapshot = np.array(data, copy=True)
+        try:
+            self.queue.put((path, snapshot, encoder, time.time()), block=self.block, timeout=self.timeout)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            print(f"Capture queue full, dropped {path}")
+            return False
+        with self.lock:
+            self.submitted += 1
+        return True
+
+    def _write(self, path, snapshot, encoder):
+        # Write next to the destination and rename over it, so a crash or power
+        # loss never leaves a half-written capture under the final name
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix=os.path.splitext(path)[1])
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                encoder(file, snapshot)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _worker_loop(self):
+        """Thread function that drains the capture queue"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            path, snapshot, encoder, queued_at = item
+            start = time.time()
+            try:
+                self._write(path, snapshot, encoder)
+                with self.lock:
+                    self.written += 1
+                    self.last_latency = time.time() - start
+                    self.max_latency = max(self.max_latency, self.last_latency)
+                    self.total_latency += self.last_latency
+                print(f"Display data saved to {path}")
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                print(f"Error saving capture {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def get_metrics(self):
+        """
+        Returns a dict of queue depth, counters and write latencies (seconds).
+        """
+        with self.lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'last_latency': self.last_latency,
+                'max_latency': self.max_latency,
+                'mean_latency': self.total_latency / self.written if self.written else 0.0,
+            }
+
+    def flush(self):
+        """
+        Wait until every queued capture has been written.
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        Write out whatever is queued and stop the worker thread.
+        """
+        if self.running:
+            self.running = False
+            self.queue.put(None)
+            self.worker.join()
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from ImageToDMX import make_indicesHS
+from receiver_config import compile_plan, plan_receivers, UNIVERSE_SIZE
+
+
+def watched_files(path, config):
+    """The config file itself plus every layout file its regions refer to"""
+    files = [path]
+    if isinstance(config, dict):
+        base_dir = os.path.dirname(os.path.abspath(path))
+        for controller in config.get('controllers', []):
+            for region in controller.get('regions', []):
+                if 'layout' in region:
+                    files.append(os.path.join(base_dir, region['layout']))
+    return files
+
+
+def validate_receivers(receivers, shape):
+    """
+    Check a plan before it goes live. Raises ValueError describing the first problem.
+    """
+    if not receivers:
+        raise ValueError("Plan has no receivers")
+    rows, cols = shape[:2]
+    used = {}
+    universe = 1
+    for receiver in receivers:
+        coords = receiver['addressing_array']
+        if len(coords) != receiver['pixel_count']:
+            raise ValueError(f"{receiver['ip']}: {len(coords)} coordinates for {receiver['pixel_count']} pixels")
+        if coords.size and (coords.min() < 0 or coords[:, 0].max() >= rows or coords[:, 1].max() >= cols):
+            raise ValueError(f"{receiver['ip']}: pixels outside the {rows}x{cols} canvas")
+        universe = receiver.get('universe', universe)
+        for u in range(universe, universe + -(-receiver['pixel_count'] // UNIVERSE_SIZE)):
+            if u in used:
+                raise ValueError(f"Universe {u} used by both {used[u]} and {receiver['ip']}")
+            used[u] = receiver['ip']
+        universe += -(-receiver['pixel_count'] // UNIVERSE_SIZE)
+
+
+def build_receivers(path, shape):
+    """
+    Load a receiver config (compiled on the fly) or an already compiled plan.
+
+    :return: (receivers, pair_colors or None, files to watch)
+    """
+    with open(path) as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        plan, pair_colors = config, None
+    else:
+        plan = compile_plan(config, os.path.dirname(os.path.abspath(path)))
+        pair_colors = config.get('pair_colors')
+    receivers = plan_receivers(plan)
+    validate_receivers(receivers, shape)
+    if pair_colors is not None and (not pair_colors or np.shape(pair_colors)[1:] != (3,)):
+        raise ValueError("pair_colors must be a list of RGB triples")
+    return receivers, pair_colors, watched_files(path, config)
+
+
+def build_layout_receivers(receivers, shape):
+    """
+    Build hand-written receivers whose pixels come from layout files: dicts with
+    'ip' and 'layout' (a file in the layout.txt format), and optionally
+    'pixel_count' (default: every pixel in the layout) and 'universe'.
+
+    :return: (receivers, None, layout files to watch)
+    """
+    built = []
+    for receiver in receivers:
+        receiver = dict(receiver)
+        receiver['addressing_array'] = make_indicesHS(receiver.pop('layout'))
+        receiver.setdefault('pixel_count', len(receiver['addressing_array']))
+        built.append(receiver)
+    validate_receivers(built, shape)
+    return built, None, [os.path.abspath(receiver['layout']) for receiver in receivers]
+
+
+class ConfigWatcher:
+    def __init__(self, source, shape, poll_interval=1.0):
+        """
+        Watches a receiver config (or compiled plan), or a list of hand-written
+        receivers, and the layout files they use. When any of them changes, the
+        new plan is compiled and validated on a background thread; the render
+        loop picks it up between frames with take_update(). A plan that fails to
+        build or validate is reported and the one in use is kept.
+
+        :param source: Receiver config or plan JSON path, or receiver dicts for build_layout_receivers
+        :param shape: Canvas shape, to check pixels stay on the canvas
+        :param poll_interval: Seconds between checks of the file mtimes
+        """
+        self.source = source
+        self.path = source if isinstance(source, str) else "receiver layouts"
+        self.shape = shape
+        self.poll_interval = poll_interval
+        # The first plan is built synchronously: without one there is nothing to send to
+        self.receivers, self.pair_colors, self.files = self._build()
+        self.mtimes = self._mtimes()
+        self.pending = None
+        self.lock = threading.Lock()
+        self.running = False
+        self.update_thread = None
+
+    def _build(self):
+        if isinstance(self.source, str):
+            return build_receivers(self.source, self.shape)
+        return build_layout_receivers(self.source, self.shape)
+
+    def _mtimes(self):
+        mtimes = {}
+        for file in self.files:
+            try:
+                mtimes[file] = os.stat(file).st_mtime
+            except OSError:
+                mtimes[file] = None
+        return mtimes
+
+    def check(self):
+        """
+        Rebuild the plan if any watched file changed. Returns True if a new plan is pending.
+        """
+        mtimes = self._mtimes()
+        if mtimes == self.mtimes:
+            return False
+        self.mtimes = mtimes
+        try:
+            receivers, pair_colors, files = self._build()
+        except Exception as e:
+            print(f"Error reloading {self.path}, keeping the current plan: {e}")
+            return False
+        # The new config may refer to different layout files
+        self.files = files
+        self.mtimes = self._mtimes()
+        with self.lock:
+            self.pending = (receivers, pair_colors)
+        print(f"Reloaded {self.path}: {len(receivers)} receivers, "
+              f"{sum(r['pixel_count'] for r in receivers)} pixels")
+        return True
+
+    def take_update(self):
+        """
+        Returns (receivers, pair_colors or None) if a new plan is ready, else None.
+        Call from the render loop between frames.
+        """
+        if self.pending is None:
+            return None
+        with self.lock:
+            update, self.pending = self.pending, None
+        if update is not None:
+            self.receivers, self.pair_colors = update
+        return update
+
+    def _update_loop(self):
+        """Thread function that watches the files"""
+        while self.running:
+            self.check()
+            time.sleep(self.poll_interval)
+
+    def start_update_thread(self):
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop)
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        self.running = False
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
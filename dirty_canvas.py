@@ -0,0 +1,98 @@
+import numpy as np
+
+# Above this many separate dirty rectangles they are merged into their bounding box
+MAX_DIRTY_RECTS = 32
+
+
+def union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+def lit_extent(pixels, origin=(0, 0)):
+    """
+    Bounding box (row_start, row_end, col_start, col_end) of the non-zero pixels, or None.
+    """
+    lit = pixels.any(axis=2)
+    rows = np.flatnonzero(lit.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(lit.any(axis=0))
+    return (origin[0] + int(rows[0]), origin[0] + int(rows[-1]) + 1,
+            origin[1] + int(cols[0]), origin[1] + int(cols[-1]) + 1)
+
+
+class DirtyCanvas:
+    def __init__(self, shape):
+        """
+        Float canvas that keeps track of where anything is happening: the extent
+        of pixels that are still lit, which decay is limited to, and the
+        rectangles changed since the last send, which the sender is limited to.
+        Work per frame then follows the amount of activity, not the panel size.
+
+        :param shape: (rows, cols, 3)
+        """
+        self.pixels = np.zeros(shape)
+        # uint8 copy of the canvas as last converted for sending
+        self.output = np.zeros(shape, dtype=np.uint8)
+        self.live = None
+        self.dirty = []
+
+    def mark(self, bounds):
+        """
+        Record a changed area, given as stamp_spot's inclusive (x_min, x_max, y_min, y_max) or None.
+        """
+        if bounds is None:
+            return
+        rect = (bounds[0], bounds[1] + 1, bounds[2], bounds[3] + 1)
+        self.live = union(self.live, rect)
+        self._add_dirty(rect)
+
+    def _add_dirty(self, rect):
+        self.dirty.append(rect)
+        if len(self.dirty) > MAX_DIRTY_RECTS:
+            merged = None
+            for r in self.dirty:
+                merged = union(merged, r)
+            self.dirty = [merged]
+
+    def decay(self, rate):
+        """
+        Fade the lit part of the canvas. Values that drop below 1 are cleared, as
+        they already show as 0, so the lit extent shrinks as the drawing fades out.
+        """
+        if self.live is None:
+            return
+        r0, r1, c0, c1 = self.live
+        region = self.pixels[r0:r1, c0:c1]
+        region *= rate
+        region[region < 1] = 0
+        self._add_dirty(self.live)
+        self.live = lit_extent(region, (r0, c0))
+
+    def load(self, frame):
+        """Replace the whole canvas (gallery image, replay frame, restored state)"""
+        np.copyto(self.pixels, frame, casting='unsafe')
+        self.live = lit_extent(self.pixels)
+        self.dirty = [(0, self.pixels.shape[0], 0, self.pixels.shape[1])]
+
+    def take_dirty(self):
+        """
+        Bring the uint8 output up to date in the dirty rectangles and hand over
+        those whose output actually changed (a cursor resting on its own spot,
+        for instance, re-stamps the same values every frame).
+
+        :return: (uint8 frame, list of (row_start, row_end, col_start, col_end))
+        """
+        dirty, self.dirty = self.dirty, []
+        changed = []
+        for r0, r1, c0, c1 in dirty:
+            converted = self.pixels[r0:r1, c0:c1].astype(np.uint8)
+            target = self.output[r0:r1, c0:c1]
+            if not np.array_equal(converted, target):
+                target[...] = converted
+                changed.append((r0, r1, c0, c1))
+        return self.output, changed
@@ -0,0 +1,148 @@
+import socket
+import struct
+import uuid
+from collections import namedtuple
+
+# E1.31 (sACN) data packets, as sent by the sacn library and read by the Pixlites.
+# Root layer, framing layer and DMP layer headers are 126 bytes, followed by up to 512 DMX slots.
+ACN_PORT = 5568
+ACN_PACKET_ID = b'ASC-E1.17\x00\x00\x00'
+VECTOR_ROOT_E131_DATA = 0x00000004
+VECTOR_E131_DATA_PACKET = 0x00000002
+VECTOR_DMP_SET_PROPERTY = 0x02
+OPTION_PREVIEW = 0x80
+OPTION_STREAM_TERMINATED = 0x40
+HEADER = struct.Struct('>HH12sHI16sHI64sBHBBHHBBHHHB')
+HEADER_SIZE = HEADER.size  # 126
+DEFAULT_PRIORITY = 100
+DEFAULT_CID = uuid.uuid5(uuid.NAMESPACE_DNS, 'futuresketch').bytes
+
+E131Packet = namedtuple('E131Packet', 'universe sequence priority options source_name cid data')
+
+
+def multicast_address(universe):
+    return f"239.255.{universe >> 8}.{universe & 0xFF}"
+
+
+def build_data_packet(universe, data, sequence=0, priority=DEFAULT_PRIORITY, source_name="FutureSketch",
+                      cid=DEFAULT_CID, options=0, out=None):
+    """
+    Build an E1.31 data packet.
+
+    :param data: Up to 512 bytes of DMX slot data
+    :param out: Optional bytearray of at least HEADER_SIZE + len(data) bytes to build into (no allocation)
+    :return: The packet (out, trimmed to length, when given)
+    """
+    length = HEADER_SIZE + len(data)
+    packet = out if out is not None else bytearray(length)
+    HEADER.pack_into(
+        packet, 0,
+        0x0010, 0x0000, ACN_PACKET_ID, 0x7000 | (length - 16), VECTOR_ROOT_E131_DATA, cid,
+        0x7000 | (length - 38), VECTOR_E131_DATA_PACKET, source_name.encode()[:63], priority, 0,
+        sequence & 0xFF, options, universe,
+        0x7000 | (length - 115), VECTOR_DMP_SET_PROPERTY, 0xA1, 0x0000, 0x0001, len(data) + 1, 0x00)
+    packet[HEADER_SIZE:length] = data
+    return packet if out is None else memoryview(packet)[:length]
+
+
+def parse_data_packet(packet):
+    """
+    :return: E131Packet with data as a memoryview into packet, or None if it is not an E1.31 data packet
+    """
+    if len(packet) < HEADER_SIZE:
+        return None
+    fields = HEADER.unpack_from(packet, 0)
+    if (fields[2] != ACN_PACKET_ID or fields[4] != VECTOR_ROOT_E131_DATA or fields[7] != VECTOR_E131_DATA_PACKET
+            or fields[15] != VECTOR_DMP_SET_PROPERTY or fields[20] != 0):
+        return None
+    slot_count = min(fields[19] - 1, len(packet) - HEADER_SIZE)
+    return E131Packet(universe=fields[13], sequence=fields[11], priority=fields[9], options=fields[12],
+                      source_name=fields[8].split(b'\x00', 1)[0].decode(errors='replace'),
+                      cid=fields[5], data=memoryview(packet)[HEADER_SIZE:HEADER_SIZE + slot_count])
+
+
+def open_receiver(port=ACN_PORT, bind_address='', universes=(), timeout=0.5):
+    """
+    UDP socket receiving E1.31 on port, joined to the multicast group of each given universe.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((bind_address, port))
+    for universe in universes:
+        membership = socket.inet_aton(multicast_address(universe)) + socket.inet_aton('0.0.0.0')
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError as e:
+            print(f"Could not join multicast for universe {universe}: {e}")
+    sock.settimeout(timeout)
+    return sock
+
+
+class DirectOutput:
+    def __init__(self, sender, universe):
+        self.sender = sender
+        self.universe = universe
+        self.destination = None
+        self.priority = sender.priority
+        self.sequence = 0
+        self._dmx_data = b''
+
+    @property
+    def dmx_data(self):
+        return self._dmx_data
+
+    @dmx_data.setter
+    def dmx_data(self, data):
+        self._dmx_data = data
+        if not self.sender.manual_flush:
+            self.sender.transmit(self)
+
+
+class DirectSender:
+    def __init__(self, source_name="FutureSketch", priority=DEFAULT_PRIORITY, cid=DEFAULT_CID, port=ACN_PORT):
+        """
+        Minimal E1.31 sender with the parts of the sacn library's sACNsender interface
+        that SACNPixelSender uses. Unlike sACNsender it has no background thread:
+        a universe goes out as soon as its dmx_data is set, or on flush() when
+        manual_flush is set, so callers control exactly when packets leave.
+        """
+        self.source_name = source_name
+        self.priority = priority
+        self.cid = cid
+        self.port = port
+        self.manual_flush = False
+        self.outputs = {}
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.buffer = bytearray(HEADER_SIZE + 512)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.sock.close()
+
+    def activate_output(self, universe):
+        self.outputs[universe] = DirectOutput(self, universe)
+
+    def deactivate_output(self, universe):
+        output = self.outputs.pop(universe)
+        if output.destination is not None:
+            # Tell receivers the stream ended rather than letting it time out
+            self.transmit(output, OPTION_STREAM_TERMINATED)
+
+    def get_active_outputs(self):
+        return tuple(self.outputs)
+
+    def __getitem__(self, universe):
+        return self.outputs[universe]
+
+    def transmit(self, output, options=0):
+        destination = output.destination or multicast_address(output.universe)
+        packet = build_data_packet(output.universe, output.dmx_data, output.sequence, output.priority,
+                                   self.source_name, self.cid, options, out=self.buffer)
+        output.sequence = (output.sequence + 1) & 0xFF
+        self.sock.sendto(packet, (destination, self.port))
+
+    def flush(self, universes=None):
+        for universe in self.outputs if universes is None else universes:
+            self.transmit(self.outputs[universe])
@@ -0,0 +1,221 @@
+import os
+import struct
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+# Shared memory layout:
+#   header    - magic, version, slot count, rows, cols, channels, writer pid, frames published
+#   slot table - per slot: sequence number, frame number, timestamp
+#   frames    - slot count * rows * cols * channels uint8
+# Each slot is guarded by its sequence number (odd while being written), so
+# readers never block the render loop and simply retry or skip on a clash.
+TAP_MAGIC = b'FSTP'
+TAP_VERSION = 1
+TAP_HEADER = struct.Struct('<4sHHHHHI2xQ')
+SLOT_DTYPE = np.dtype([('seq', '<u8'), ('frame', '<u8'), ('time', '<f8')])
+DEFAULT_NAME = "futuresketch_canvas"
+
+
+def _layout(slots, rows, cols, channels):
+    table_offset = TAP_HEADER.size
+    frames_offset = table_offset + slots * SLOT_DTYPE.itemsize
+    frames_offset += -frames_offset % 64  # align frame data
+    return table_offset, frames_offset, frames_offset + slots * rows * cols * channels
+
+
+def _pid_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, but belongs to another user
+    return True
+
+
+def _remove_stale(name):
+    """
+    Unlink a segment left behind by a writer that did not exit cleanly. A
+    segment whose writer is still running, or that is not a frame tap, is left
+    alone and FileExistsError raised.
+    """
+    try:
+        existing = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    try:
+        if existing.size < TAP_HEADER.size:
+            raise FileExistsError(f"Shared memory {name} exists and is not a frame tap")
+        magic, _, _, _, _, _, writer, _ = TAP_HEADER.unpack_from(existing.buf, 0)
+        if magic != TAP_MAGIC:
+            raise FileExistsError(f"Shared memory {name} exists and is not a frame tap")
+        if _pid_alive(writer):
+            raise FileExistsError(f"Frame tap {name} is in use by a running writer (pid {writer})")
+        existing.unlink()
+    finally:
+        existing.close()
+
+
+class FrameTapWriter:
+    def __init__(self, shape, name=DEFAULT_NAME, slots=8):
+        """
+        Publishes finished frames into a shared memory ring that any number of
+        other processes can follow with FrameTapReader.
+
+        :param shape: Canvas shape (rows, cols, channels)
+        :param name: Shared memory segment name (appears under /dev/shm)
+        :param slots: Number of frames kept in the ring
+        """
+        rows, cols, channels = shape
+        table_offset, frames_offset, size = _layout(slots, rows, cols, channels)
+        _remove_stale(name)
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.pid = os.getpid()
+        self.slots = slots
+        self.table = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=self.shm.buf, offset=table_offset)
+        self.frames = np.ndarray((slots, rows, cols, channels), dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=frames_offset)
+        self.table[:] = 0
+        self.published = 0
+        self._write_header()
+
+    def _write_header(self):
+        rows, cols, channels = self.frames.shape[1:]
+        TAP_HEADER.pack_into(self.shm.buf, 0, TAP_MAGIC, TAP_VERSION, self.slots, rows, cols, channels,
+                             self.pid, self.published)
+
+    def publish(self, frame, timestamp=None):
+        """
+        Copy a finished frame into the next slot. Float canvases are truncated to uint8.
+        """
+        slot = self.published % self.slots
+        entry = self.table[slot:slot + 1]
+        seq = int(entry['seq'][0])
+        entry['seq'] = seq + 1  # odd: slot is being written
+        np.copyto(self.frames[slot], frame, casting='unsafe')
+        entry['frame'] = self.published
+        entry['time'] = time.time() if timestamp is None else timestamp
+        entry['seq'] = seq + 2
+        self.published += 1
+        self._write_header()
+
+    def close(self):
+        self.table = None
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameTapReader:
+    def __init__(self, name=DEFAULT_NAME):
+        """
+        Read-only follower of a FrameTapWriter ring in another process.
+
+        :param name: Shared memory segment name used by the writer
+        """
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Attaching registers the segment with this process's resource tracker,
+        # which would unlink it on exit and pull it out from under the writer
+        try:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+        magic, version, slots, rows, cols, channels, _, _ = TAP_HEADER.unpack_from(self.shm.buf, 0)
+        if magic != TAP_MAGIC:
+            raise ValueError(f"Shared memory {name} is not a frame tap")
+        table_offset, frames_offset, _ = _layout(slots, rows, cols, channels)
+        self.slots = slots
+        self.shape = (rows, cols, channels)
+        self.table = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=self.shm.buf, offset=table_offset)
+        self.frames = np.ndarray((slots, rows, cols, channels), dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=frames_offset)
+        self.frames.flags.writeable = False
+        self.last_frame = None
+        self.skipped = 0
+
+    @property
+    def published(self):
+        return TAP_HEADER.unpack_from(self.shm.buf, 0)[-1]
+
+    def read(self, frame_number, out=None):
+        """
+        Copy a specific frame out of the ring.
+
+        :return: (timestamp, frame), or None if it was overwritten or is mid-write
+        """
+        slot = frame_number % self.slots
+        seq = int(self.table['seq'][slot])
+        if seq % 2 or int(self.table['frame'][slot]) != frame_number:
+            return None
+        timestamp = float(self.table['time'][slot])
+        if out is None:
+            frame = self.frames[slot].copy()
+        else:
+            np.copyto(out, self.frames[slot])
+            frame = out
+        if int(self.table['seq'][slot]) != seq:
+            return None
+        return timestamp, frame
+
+    def view(self, frame_number):
+        """
+        Zero-copy, read-only view of a frame's slot. It stays valid until the
+        writer comes round to the slot again; check still_valid() after use.
+        """
+        return self.frames[frame_number % self.slots]
+
+    def still_valid(self, frame_number):
+        slot = frame_number % self.slots
+        return int(self.table['frame'][slot]) == frame_number and int(self.table['seq'][slot]) % 2 == 0
+
+    def latest(self, out=None):
+        """
+        Returns (frame_number, timestamp, frame) for the newest complete frame, or None.
+        """
+        for _ in range(3):
+            published = self.published
+            if published == 0:
+                return None
+            result = self.read(published - 1, out)
+            if result is not None:
+                return (published - 1,) + result
+        return None
+
+    def follow(self, poll_interval=0.005):
+        """
+        Generator yielding (frame_number, timestamp, frame) for each new frame.
+        A reader that falls behind jumps to the newest frame and counts the ones it skipped.
+        """
+        while True:
+            result = self.latest()
+            if result is None or result[0] == self.last_frame:
+                time.sleep(poll_interval)
+                continue
+            if self.last_frame is not None:
+                self.skipped += max(0, result[0] - self.last_frame - 1)
+            self.last_frame = result[0]
+            yield result
+
+    def close(self):
+        self.table = None
+        self.frames = None
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    # Follow the live canvas and report the frame rate seen by an external process
+    reader = FrameTapReader()
+    print(f"Following {DEFAULT_NAME}: {reader.shape}, {reader.slots} slots")
+    count = 0
+    start = time.time()
+    for frame_number, timestamp, frame in reader.follow():
+        count += 1
+        if time.time() - start >= 5:
+            print(f"{count / (time.time() - start):.1f} fps, frame {frame_number}, "
+                  f"lag {1000 * (time.time() - timestamp):.1f} ms, skipped {reader.skipped}")
+            count = 0
+            start = time.time()
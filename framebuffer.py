@@ -0,0 +1,64 @@
+import numpy as np
+from brush import stamp_spot
+
+
+class FrameBuffer:
+    def __init__(self, height, width):
+        """
+        Contiguous uint8 (height, width, 3) canvas shared by the Art-Net scripts.
+        Pixels are stored in row-major order, which is also the wire order, so the
+        output bytes are a view of the array rather than a copy.
+
+        :param height: Number of rows
+        :param width: Number of columns
+        """
+        self.height = height
+        self.width = width
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        # Flat byte view over the same memory, for serialization
+        self.bytes = memoryview(self.pixels.reshape(-1))
+
+    def __getitem__(self, index):
+        return self.pixels[index]
+
+    def __setitem__(self, index, value):
+        self.pixels[index] = value
+
+    def universe_views(self, pixels_per_universe=170):
+        """
+        Split the canvas into consecutive universe-sized byte views without copying.
+
+        :param pixels_per_universe: Pixels carried per universe (170 for 510-channel DMX)
+        :return: List of memoryviews, the last one possibly shorter
+        """
+        step = pixels_per_universe * 3
+        return [self.bytes[start:start + step] for start in range(0, len(self.bytes), step)]
+
+    def clear(self):
+        """
+        Set every pixel to black in one pass over the buffer.
+        """
+        self.pixels.fill(0)
+
+    def draw_cursors(self, points, colors):
+        """
+        Set one pixel per cursor in a single indexed assignment.
+
+        :param points: Array-like of shape (N, 2) holding (x, y) cursor positions
+        :param colors: Array-like of shape (N, 3) holding each cursor's RGB colour
+        """
+        points = np.asarray(points, dtype=np.intp)
+        if len(points) == 0:
+            return
+        self.pixels[points[:, 1], points[:, 0]] = colors
+
+    def stamp(self, x, y, size, color):
+        """
+        Stamp a soft round brush the same way FS.py does.
+
+        :return: Touched bounds as (y_min, y_max, x_min, x_max), or None
+        """
+        return stamp_spot(self.pixels, y, x, size, color)
+
+    def tolist(self):
+        return self.pixels.tolist()
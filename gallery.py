@@ -0,0 +1,142 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class Gallery:
+    def __init__(self, directory="filtered_saves", capacity=32, poll_interval=5.0, key='display_data'):
+        """
+        Indexed, preloaded view of a directory of .npz captures for idle playback.
+        A background thread keeps the index in sync with the directory and decodes
+        captures into a bounded LRU cache, so picking the next image never touches
+        the SD card from the render loop.
+
+        :param directory: Directory holding the .npz captures
+        :param capacity: Maximum number of decoded frames kept in memory
+        :param poll_interval: Seconds between checks of the directory for changes
+        :param key: Array name inside each .npz
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self.key = key
+
+        self.files = []
+        self.cache = OrderedDict()
+        self.requested = []
+        self.dir_mtime = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+        self.running = False
+        self.update_thread = None
+        self.start_update_thread()
+
+    def _scan(self):
+        """Re-read the directory listing if it changed since the last scan"""
+        try:
+            mtime = os.stat(self.directory).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self.dir_mtime:
+            return
+        self.dir_mtime = mtime
+        files = sorted(f for f in os.listdir(self.directory) if f.endswith('.npz')) if mtime is not None else []
+        with self.lock:
+            self.files = files
+            present = set(files)
+            for name in [name for name in self.cache if name not in present]:
+                del self.cache[name]
+            self.requested = [name for name in self.requested if name in present]
+        print(f"Gallery indexed {len(files)} images in {self.directory}")
+
+    def _decode(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            with np.load(path) as loaded:
+                if self.key not in loaded:
+                    print(f"No {self.key} array found in {path}")
+                    return None
+                return np.clip(loaded[self.key], 0, 255).astype(np.uint8)
+        except Exception as e:
+            print(f"Error loading file {path}: {e}")
+            return None
+
+    def _next_to_decode(self):
+        with self.lock:
+            if self.requested:
+                return self.requested.pop(0)
+            if len(self.cache) < self.capacity:
+                missing = [name for name in self.files if name not in self.cache]
+                if missing:
+                    return random.choice(missing)
+        return None
+
+    def _update_loop(self):
+        """Thread function that tracks the directory and fills the cache"""
+        last_scan = 0
+        while self.running:
+            if time.time() - last_scan >= self.poll_interval:
+                self._scan()
+                last_scan = time.time()
+
+            name = self._next_to_decode()
+            if name is None:
+                self.wake.wait(self.poll_interval)
+                self.wake.clear()
+                continue
+
+            frame = self._decode(name)
+            with self.lock:
+                if frame is None:
+                    # Leave broken files out of the rotation until the directory changes
+                    if name in self.files:
+                        self.files.remove(name)
+                    continue
+                self.cache[name] = frame
+                self.cache.move_to_end(name)
+                while len(self.cache) > self.capacity:
+                    self.cache.popitem(last=False)
+
+    def start_update_thread(self):
+        """Start the background thread for indexing and decoding"""
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop)
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        """Stop the background thread"""
+        self.running = False
+        self.wake.set()
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
+
+    def next_frame(self):
+        """
+        Returns a random image as a uint8 array the caller may draw on, or None if
+        nothing has been decoded yet. Never blocks on disk: if the randomly chosen
+        image is not cached, a cached one is returned and the other is decoded in
+        the background for a later call.
+        """
+        with self.lock:
+            if not self.files:
+                return None
+            name = random.choice(self.files)
+            if name not in self.cache:
+                if name not in self.requested:
+                    self.requested.append(name)
+                self.wake.set()
+                if not self.cache:
+                    return None
+                name = random.choice(list(self.cache))
+            self.cache.move_to_end(name)
+            return self.cache[name].copy()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.files)
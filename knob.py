@@ -138,6 +138,18 @@ class RotaryEncoderArray:
             
             return constrained_positions
 
+    def restore(self, positions, buttons=None):
+        """
+        Set positions (and button states) from a saved state, e.g. after a restart.
+        """
+        with self.lock:
+            n = min(len(positions), self.encoder_count)
+            self.positions[:n] = np.clip(positions[:n], self.min_values[:n], self.max_values[:n])
+            self.last_read_positions = self.positions.copy()
+            if buttons is not None and len(self.button_state):
+                m = min(len(buttons), len(self.button_state))
+                self.button_state[:m] = buttons[:m]
+
     def get_buttons(self):
         """
         Returns the current positions as a numpy array.
@@ -0,0 +1,318 @@
+import argparse
+import random
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+# UDP protocol between knob stations and the renderer.
+# Header: magic, version, flags, station id, session id (random per agent start), sequence number,
+# followed by a record count and (kind, index, value) records.
+STATION_PORT = 6460
+PACKET_MAGIC = b'FSKN'
+PACKET_VERSION = 1
+PACKET_HEADER = struct.Struct('<4sBBHIIB')
+RECORD = struct.Struct('<BBh')
+FLAG_ABSOLUTE = 0x1
+KIND_ENCODER = 0
+KIND_BUTTON = 1
+MAX_RECORDS = 255
+
+
+def encode_packet(station_id, session, seq, records, absolute=False):
+    """
+    :param records: List of (kind, index, value)
+    """
+    parts = [PACKET_HEADER.pack(PACKET_MAGIC, PACKET_VERSION, FLAG_ABSOLUTE if absolute else 0,
+                                station_id, session, seq & 0xFFFFFFFF, len(records))]
+    parts.extend(RECORD.pack(kind, index, int(value)) for kind, index, value in records)
+    return b''.join(parts)
+
+
+def decode_packet(data):
+    """
+    :return: (station id, session, seq, absolute, records), or None for a malformed packet
+    """
+    if len(data) < PACKET_HEADER.size:
+        return None
+    magic, version, flags, station_id, session, seq, count = PACKET_HEADER.unpack_from(data)
+    if magic != PACKET_MAGIC or version != PACKET_VERSION:
+        return None
+    if len(data) < PACKET_HEADER.size + count * RECORD.size:
+        return None
+    records = [RECORD.unpack_from(data, PACKET_HEADER.size + i * RECORD.size) for i in range(count)]
+    return station_id, session, seq, bool(flags & FLAG_ABSOLUTE), records
+
+
+class KnobStationAgent:
+    def __init__(self, encoders, renderer_address, station_id, poll_interval=0.005, absolute_interval=0.5):
+        """
+        Input-only agent for a knob station. Watches a RotaryEncoderArray and sends
+        changed encoder positions and button states to the renderer, plus the full
+        state every absolute_interval so a lost packet is corrected quickly.
+
+        Args:
+            encoders: RotaryEncoderArray (or anything with positions, button_state and lock)
+            renderer_address: (host, port) of the renderer's RemoteInputMerger
+            station_id: Number identifying this station to the renderer
+            poll_interval: Seconds between checks for changes
+            absolute_interval: Seconds between full-state packets
+        """
+        self.encoders = encoders
+        self.renderer_address = renderer_address
+        self.station_id = station_id
+        self.poll_interval = poll_interval
+        self.absolute_interval = absolute_interval
+        self.session = random.getrandbits(32)
+        self.seq = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.last_positions = None
+        self.last_buttons = None
+        self.last_absolute = 0.0
+        self.running = False
+        self.update_thread = None
+
+    def _read(self):
+        # Raw positions: the renderer limits how fast they are followed (see RemoteInputMerger.get_positions)
+        with self.encoders.lock:
+            return self.encoders.positions.copy(), self.encoders.button_state.copy()
+
+    def _send(self, records, absolute):
+        self.sock.sendto(encode_packet(self.station_id, self.session, self.seq, records, absolute),
+                         self.renderer_address)
+        self.seq += 1
+
+    def step(self, now=None):
+        """
+        Send whatever changed since the last call (or the full state when due).
+        """
+        now = time.time() if now is None else now
+        positions, buttons = self._read()
+        absolute = self.last_positions is None or now - self.last_absolute >= self.absolute_interval
+        if absolute:
+            changed_positions = range(len(positions))
+            changed_buttons = range(len(buttons))
+            self.last_absolute = now
+        else:
+            changed_positions = np.flatnonzero(positions != self.last_positions)
+            changed_buttons = np.flatnonzero(buttons != self.last_buttons)
+        records = [(KIND_ENCODER, i, positions[i]) for i in changed_positions]
+        records += [(KIND_BUTTON, i, buttons[i]) for i in changed_buttons]
+        self.last_positions, self.last_buttons = positions, buttons
+        if records or absolute:
+            self._send(records[:MAX_RECORDS], absolute)
+
+    def _update_loop(self):
+        """Thread function that keeps the renderer up to date"""
+        while self.running:
+            try:
+                self.step()
+            except OSError as e:
+                print(f"Error sending to renderer: {e}")
+            time.sleep(self.poll_interval)
+
+    def start_update_thread(self):
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop)
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        self.running = False
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
+
+
+class RemoteInputMerger:
+    def __init__(self, station_ids, encoders_per_station, min_values=None, max_values=None,
+                 local=None, port=STATION_PORT, bind_address='0.0.0.0'):
+        """
+        Renderer side of the knob stations. Receives station packets and merges
+        them into one positions/buttons array with the same interface as
+        RotaryEncoderArray, so FS.py can use it in place of (or alongside) local knobs.
+
+        Args:
+            station_ids: Station ids in slot order; station k fills slots k*encoders_per_station onwards
+            encoders_per_station: Encoders (and buttons) per station
+            min_values: Per-station encoder minimums (defaults to all zeros)
+            max_values: Per-station encoder maximums (defaults to all 100)
+            local: Optional local RotaryEncoderArray whose knobs come first
+            port: UDP port to listen on
+            bind_address: Interface to listen on
+        """
+        self.station_slots = {station_id: k * encoders_per_station for k, station_id in enumerate(station_ids)}
+        self.per_station = encoders_per_station
+        count = len(station_ids) * encoders_per_station
+        self.min_values = np.tile(min_values if min_values is not None else [0] * encoders_per_station,
+                                  len(station_ids))
+        self.max_values = np.tile(max_values if max_values is not None else [100] * encoders_per_station,
+                                  len(station_ids))
+        self.local = local
+
+        self.positions = np.zeros(count, dtype=int)
+        self.last_read_positions = np.zeros(count, dtype=int)
+        self.button_state = np.zeros(count, dtype=int)
+        self.sessions = {}
+        self.last_seq = {}
+        self.last_seen = {}
+        self.packets = 0
+        self.lost = 0
+        self.stale = 0
+        self.lock = threading.Lock()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((bind_address, port))
+        self.sock.settimeout(0.5)
+        self.running = False
+        self.update_thread = None
+        self.start_update_thread()
+
+    def handle_packet(self, data):
+        """
+        Apply one station packet. Returns True if it was applied.
+        """
+        decoded = decode_packet(data)
+        if decoded is None:
+            return False
+        station_id, session, seq, absolute, records = decoded
+        offset = self.station_slots.get(station_id)
+        if offset is None:
+            return False
+        with self.lock:
+            if self.sessions.get(station_id) != session:
+                # Station (re)started: accept its sequence numbers from scratch
+                self.sessions[station_id] = session
+            else:
+                gap = (seq - self.last_seq[station_id]) & 0xFFFFFFFF
+                if gap == 0 or gap >= 0x80000000:
+                    self.stale += 1
+                    return False
+                self.lost += gap - 1
+            self.last_seq[station_id] = seq
+            self.last_seen[station_id] = time.time()
+            self.packets += 1
+            for kind, index, value in records:
+                if index >= self.per_station:
+                    continue
+                slot = offset + index
+                if kind == KIND_ENCODER:
+                    self.positions[slot] = min(self.max_values[slot], max(self.min_values[slot], value))
+                elif kind == KIND_BUTTON:
+                    self.button_state[slot] = value
+        return True
+
+    def _update_loop(self):
+        """Thread function that receives station packets"""
+        while self.running:
+            try:
+                data, _ = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle_packet(data)
+
+    def start_update_thread(self):
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop)
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        self.running = False
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
+        self.sock.close()
+
+    def get_positions(self):
+        """
+        Returns local positions followed by the remote ones. Remote positions move
+        by at most 1 unit per read, as local ones do, but unlike
+        RotaryEncoderArray.get_positions() the steps of a fast spin are not dropped:
+        the station's position stays the target and is caught up with over the
+        following reads. Dropping them here would not stick, as the next packet
+        from the station carries its position again.
+        """
+        with self.lock:
+            step = np.clip(self.positions - self.last_read_positions, -1, 1)
+            self.last_read_positions = self.last_read_positions + step
+            remote = self.last_read_positions.copy()
+        if self.local is None:
+            return remote
+        return np.concatenate([self.local.get_positions(), remote])
+
+    def restore(self, positions, buttons=None):
+        """
+        Set positions (and button states) from a saved state. Remote stations
+        overwrite theirs with their next full-state packet.
+        """
+        local_count = len(self.local.positions) if self.local is not None else 0
+        if self.local is not None:
+            self.local.restore(positions[:local_count], None if buttons is None else buttons[:local_count])
+        remote_positions = np.asarray(positions[local_count:])
+        with self.lock:
+            n = min(len(remote_positions), len(self.positions))
+            self.positions[:n] = np.clip(remote_positions[:n], self.min_values[:n], self.max_values[:n])
+            self.last_read_positions = self.positions.copy()
+            if buttons is not None:
+                remote_buttons = np.asarray(buttons[local_count:])
+                m = min(len(remote_buttons), len(self.button_state))
+                self.button_state[:m] = remote_buttons[:m]
+
+    def get_buttons(self):
+        with self.lock:
+            remote = self.button_state.copy()
+        if self.local is None:
+            return remote
+        return np.concatenate([self.local.get_buttons(), remote])
+
+    def get_stats(self):
+        """Packet counters and seconds since each station was last heard from"""
+        with self.lock:
+            now = time.time()
+            return {
+                'packets': self.packets,
+                'lost': self.lost,
+                'stale': self.stale,
+                'silence': {station: now - seen for station, seen in self.last_seen.items()},
+            }
+
+    def cleanup(self):
+        self.stop_update_thread()
+        if self.local is not None:
+            self.local.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a knob station that sends its encoders to the renderer")
+    parser.add_argument("renderer", help="IP address of the board running FS.py")
+    parser.add_argument("--station", type=int, required=True, help="station id, as listed in FS.py remote_stations")
+    parser.add_argument("--port", type=int, default=STATION_PORT)
+    args = parser.parse_args()
+
+    from knob import RotaryEncoderArray as REA
+
+    # Same wiring as the renderer's own knobs
+    encoder_pins = [
+        ("P8_7", "P8_8"), ("P8_9", "P8_10"), ("P8_11", "P8_12"), ("P8_13", "P8_14"),
+        ("P8_15", "P8_16"), ("P8_17", "P8_18"), ("P9_11", "P9_12"), ("P9_13", "P9_14"),
+    ]
+    button_pins = ["P9_15", "P9_16", "P9_17", "P9_18", "P9_21", "P9_22", "P9_23", "P9_24"]
+    min_values = [0, 0, 0, 0, 0, 0, 0, 0]
+    max_values = [37, 61, 37, 61, 37, 61, 37, 61]
+    encoders = REA(encoder_pins, min_values, max_values, button_pins)
+
+    agent = KnobStationAgent(encoders, (args.renderer, args.port), args.station)
+    agent.start_update_thread()
+    print(f"Station {args.station} sending to {args.renderer}:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Exiting cleanly")
+        agent.stop_update_thread()
+        encoders.cleanup()
@@ -0,0 +1,312 @@
+import argparse
+import random
+import socket
+import threading
+import time
+import numpy as np
+import ImageToDMX as imdmx
+from brush import stamp_spot
+from dirty_canvas import DirtyCanvas
+from e131 import ACN_PORT, DirectSender, open_receiver, parse_data_packet
+from output_rate import AdaptiveOutputRate, frame_to_send
+from universe_pacing import UniversePacer
+
+# Stages an encoder event passes through on its way to light, in order:
+#   poll   - the encoder thread has counted the detent
+#   read   - get_positions() has handed the new position to the render loop
+#   render - the spot has been stamped onto the canvas
+#   send   - the frame carrying it was handed to the sender
+#   wire   - the loopback receiver saw the pixel lit in an arriving packet
+STAGES = ('poll', 'read', 'render', 'send', 'wire')
+
+
+class LatencyTracer:
+    def __init__(self):
+        """
+        Follows individual encoder events through the pipeline by the cursor
+        position they should produce, recording a monotonic timestamp per stage.
+        """
+        self.events = []
+        self.open = []
+        self.lock = threading.Lock()
+
+    def event(self, x, y, start=None):
+        """Register an input event, happening at start, that should move the cursor to (x, y)"""
+        with self.lock:
+            event = {'target': (int(x), int(y)), 'start': time.monotonic() if start is None else start}
+            self.events.append(event)
+            self.open.append(event)
+            return event
+
+    def mark(self, stage, matches=None):
+        """
+        Stamp every open event that has reached the stage before this one and
+        for which matches(event) is true (all of them when matches is None).
+        """
+        now = time.monotonic()
+        previous = STAGES[STAGES.index(stage) - 1] if stage != STAGES[0] else 'start'
+        with self.lock:
+            for event in self.open:
+                if stage not in event and previous in event and (matches is None or matches(event)):
+                    event[stage] = now
+            self.open = [event for event in self.open if STAGES[-1] not in event]
+
+    def mark_position(self, stage, x, y):
+        self.mark(stage, lambda event: event['target'] == (x, y))
+
+    def report(self):
+        """
+        Print per-stage and total latency percentiles (ms) for completed events.
+        """
+        done = [event for event in self.events if STAGES[-1] in event]
+        print(f"{len(done)} of {len(self.events)} events reached the receiver")
+        if not done:
+            return {}
+        results = {}
+        previous = 'start'
+        for stage in STAGES + ('total',):
+            if stage == 'total':
+                values = np.array([event[STAGES[-1]] - event['start'] for event in done]) * 1000
+            else:
+                values = np.array([event[stage] - event[previous] for event in done]) * 1000
+                previous = stage
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            results[stage] = (p50, p90, p99, values.max())
+            print(f"{stage:>7}: p50 {p50:7.2f}  p90 {p90:7.2f}  p99 {p99:7.2f}  max {values.max():7.2f} ms")
+        return results
+
+
+class SimulatedEncoders:
+    def __init__(self, min_values, max_values, tracer, poll_interval=0.0001, detent_spacing=0.02):
+        """
+        Off-device stand-in for RotaryEncoderArray: the same background poll loop
+        and one-step-per-read get_positions(), with detents injected by turn()
+        instead of read from GPIO. A turn of several detents arrives as one CLK
+        edge every detent_spacing seconds, like a hand turning the knob.
+        """
+        self.min_values = list(min_values)
+        self.max_values = list(max_values)
+        self.encoder_count = len(min_values)
+        self.tracer = tracer
+        self.poll_interval = poll_interval
+        self.positions = np.zeros(self.encoder_count, dtype=int)
+        self.last_read_positions = np.zeros(self.encoder_count, dtype=int)
+        self.button_state = np.zeros(self.encoder_count, dtype=int)
+        self.detent_spacing = detent_spacing
+        self.pending = []  # (due time, encoder, step), in time order
+        self.lock = threading.Lock()
+        self.running = True
+        self.update_thread = threading.Thread(target=self._update_loop)
+        self.update_thread.daemon = True
+        self.update_thread.start()
+
+    def turn(self, index, detents):
+        """
+        Schedule a turn starting now. Returns the monotonic time of its last detent.
+        """
+        now = time.monotonic()
+        step = 1 if detents > 0 else -1
+        with self.lock:
+            for i in range(abs(detents)):
+                self.pending.append((now + i * self.detent_spacing, index, step))
+            self.pending.sort()
+        return now + (abs(detents) - 1) * self.detent_spacing
+
+    def update(self):
+        now = time.monotonic()
+        with self.lock:
+            if not self.pending or self.pending[0][0] > now:
+                return
+            _, index, step = self.pending.pop(0)
+            self.positions[index] = min(self.max_values[index], max(self.min_values[index],
+                                                                    self.positions[index] + step))
+            x, y = int(self.positions[0]), int(self.positions[1])
+        self.tracer.mark_position('poll', x, y)
+
+    def _update_loop(self):
+        while self.running:
+            self.update()
+            time.sleep(self.poll_interval)
+
+    def get_positions(self):
+        with self.lock:
+            step = np.clip(self.positions - self.last_read_positions, -1, 1)
+            self.last_read_positions = self.last_read_positions + step
+            self.positions = self.last_read_positions.copy()
+            return self.last_read_positions.copy()
+
+    def get_buttons(self):
+        with self.lock:
+            return self.button_state.copy()
+
+    def cleanup(self):
+        self.running = False
+        self.update_thread.join(timeout=1.0)
+
+
+class LoopbackReceiver:
+    def __init__(self, screen, tracer, port=ACN_PORT, threshold=200):
+        """
+        Receives the sender's packets on this machine and marks events whose
+        target pixel shows up lit.
+
+        :param screen: The SACNPixelSender whose output is being received
+        """
+        self.tracer = tracer
+        self.threshold = threshold
+        self.packets = 0
+        # Packets missing from each universe's sequence numbers
+        self.lost = 0
+        self.sequences = {}
+        # Where each canvas pixel ends up: (universe, first channel)
+        self.lookup = {}
+        for receiver, universes in zip(screen.receivers, screen.receiver_universes):
+            for i, (x, y) in enumerate(receiver['addressing_array'].tolist()):
+                self.lookup.setdefault((x, y), (universes[i // 170], (i % 170) * 3))
+        self.sock = open_receiver(port)
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _receive_loop(self):
+        buffer = bytearray(1144)
+        while self.running:
+            try:
+                size = self.sock.recv_into(buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            packet = parse_data_packet(buffer[:size])
+            if packet is None:
+                continue
+            self.packets += 1
+            last = self.sequences.get(packet.universe)
+            if last is not None:
+                self.lost += (packet.sequence - last - 1) & 0xFF
+            self.sequences[packet.universe] = packet.sequence
+            data = packet.data
+
+            def lit(event):
+                location = self.lookup.get(event['target'])
+                if location is None or location[0] != packet.universe:
+                    return False
+                channel = location[1]
+                return max(data[channel:channel + 3]) >= self.threshold
+            self.tracer.mark('wire', lit)
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+        self.thread.join(timeout=1.0)
+
+
+def run_trace(screen, shape, events=100, interval=0.25, max_detents=3, decay_rate=0.7, send_every=3,
+              frame_time=1 / 120, full_frames=False):
+    """
+    Drive FS.py's render pipeline with simulated knob turns and measure each
+    stage: drawing on a DirtyCanvas, the output rate deciding what goes out,
+    and sends limited to the changed universes (paced, if the screen has a
+    pacer). The canvas decays fast so every target pixel is dark before the
+    cursor reaches it, which makes "lit on arrival" unambiguous.
+
+    :param full_frames: Send the whole frame every time instead, as before the
+                        dirty tracking and output rate, to compare against
+    """
+    tracer = LatencyTracer()
+    rows, cols, _ = shape
+    encoders = SimulatedEncoders([0, 0], [rows - 1, cols - 1], tracer)
+    receiver = LoopbackReceiver(screen, tracer)
+    color = [255, 255, 255]
+    stop = threading.Event()
+
+    def inject():
+        position = [rows // 2, cols // 2]
+        for _ in range(events):
+            if stop.wait(interval):
+                return
+            axis = random.randrange(2)
+            limit = (rows, cols)[axis] - 1
+            detents = random.randint(1, max_detents) * random.choice((-1, 1))
+            if not 0 <= position[axis] + detents <= limit:
+                detents = -detents
+            position[axis] += detents
+            # Register before the detents can be polled; the event starts at the last detent
+            event = tracer.event(*position)
+            event['start'] = encoders.turn(axis, detents)
+
+    # Walk the cursor to the centre before timing anything
+    encoders.turn(0, rows // 2)
+    encoders.turn(1, cols // 2)
+    injector = threading.Thread(target=inject)
+
+    canvas = DirtyCanvas(shape)
+    output_rate = AdaptiveOutputRate()
+    last_positions = None
+    frame_counter = 0
+    try:
+        start = time.time()
+        while time.time() - start < 1.0:
+            encoders.get_positions()
+            time.sleep(frame_time)
+        injector.start()
+        while injector.is_alive() or tracer.open and time.time() - start < events * interval + 5:
+            positions = encoders.get_positions()
+            tracer.mark_position('read', positions[0], positions[1])
+            if last_positions is None or not np.array_equal(positions, last_positions):
+                output_rate.wake()
+            last_positions = positions
+            canvas.decay(decay_rate)
+            canvas.mark(stamp_spot(canvas.pixels, positions[0], positions[1], 0, color))
+            tracer.mark('render')
+            time.sleep(frame_time)
+            frame_counter += 1
+            if frame_counter >= send_every:
+                if full_frames:
+                    to_send = canvas.take_dirty()[0], None
+                else:
+                    to_send = frame_to_send(canvas, output_rate)
+                if to_send is not None:
+                    tracer.mark('send')
+                    screen.send(*to_send)
+                frame_counter = 0
+    finally:
+        stop.set()
+        encoders.cleanup()
+        time.sleep(0.2)
+        receiver.close()
+    print(f"{receiver.packets} packets received, {receiver.lost} lost")
+    if not full_frames:
+        print(f"Output rate: {output_rate.get_stats()}")
+    return tracer.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure knob-to-light latency with simulated input and a loopback receiver")
+    parser.add_argument("--layout", default="layout.txt")
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between simulated knob turns")
+    parser.add_argument("--sender", choices=("sacn", "direct"), default="sacn",
+                        help="sacn: the sacn library's threaded sender, as on the device; "
+                             "direct: packets leave as soon as a frame is sent")
+    parser.add_argument("--send-every", type=int, default=3, help="frames per send, as in FS.py")
+    parser.add_argument("--pace", type=float, default=0.0,
+                        help="spread each send's universes over this fraction of the send interval")
+    parser.add_argument("--full-frames", action="store_true",
+                        help="send every universe each time, without dirty tracking or the output rate")
+    args = parser.parse_args()
+
+    addressing = imdmx.make_indicesHS(args.layout)
+    receivers = [{'ip': '127.0.0.1', 'pixel_count': len(addressing), 'addressing_array': addressing}]
+    pacer = UniversePacer(args.send_every / 120, args.pace) if args.pace > 0 else None
+    screen = imdmx.SACNPixelSender(receivers, sender=DirectSender() if args.sender == "direct" else None,
+                                   pacer=pacer)
+    shape = (int(addressing[:, 0].max()) + 1, int(addressing[:, 1].max()) + 1, 3)
+    try:
+        run_trace(screen, shape, args.events, args.interval, send_every=args.send_every,
+                  full_frames=args.full_frames)
+    finally:
+        screen.close()
+    if pacer is not None:
+        print(f"Pacing: {pacer.get_stats()}")
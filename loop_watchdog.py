@@ -0,0 +1,127 @@
+import logging
+import logging.handlers
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from sampling_profiler import loop_stage
+
+
+def sd_notify(message):
+    """
+    Send a notification to systemd (READY=1, WATCHDOG=1, ...) if running under
+    a unit that listens for them. Returns False when there is no NOTIFY_SOCKET.
+    """
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]  # abstract namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message.encode(), address)
+        return True
+    except OSError as e:
+        print(f"Error notifying systemd: {e}")
+        return False
+
+
+class LoopWatchdog:
+    def __init__(self, stall_threshold=0.25, log_path="logs/stalls.log", stage=loop_stage,
+                 check_interval=0.05, max_bytes=1000000, backups=3):
+        """
+        Watches the render loop's heartbeat from a separate thread. When a frame
+        takes longer than stall_threshold, the main thread's stack, the loop stage
+        it is stuck in and how long it has been there go to a rolling log; the
+        total stall time is logged once the loop moves again.
+
+        Under systemd (WatchdogSec= in the unit) it sends WATCHDOG=1 only while
+        frames keep arriving, so a real hang gets the service restarted.
+
+        :param stall_threshold: Seconds without a heartbeat that count as a stall
+        :param log_path: Rolling stall log
+        :param stage: StageMarker set by the loop (shared with the profiler)
+        :param check_interval: Seconds between heartbeat checks
+        """
+        self.stall_threshold = stall_threshold
+        self.stage = stage
+        self.check_interval = check_interval
+        self.last_beat = time.monotonic()
+        self.frames = 0
+        self.stalls = 0
+        self.stall_reported = None  # frame number of the stall already logged
+        self.stall_stage = None
+        self.main_id = threading.main_thread().ident
+
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        self.log = logging.getLogger("futuresketch.watchdog")
+        self.log.setLevel(logging.INFO)
+        self.log.propagate = False
+        if not self.log.handlers:
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.log.addHandler(handler)
+
+        # systemd asks for a ping at least every WATCHDOG_USEC; ping at twice that rate
+        watchdog_usec = os.environ.get('WATCHDOG_USEC')
+        self.notify_interval = int(watchdog_usec) / 2e6 if watchdog_usec else None
+        self.last_notify = 0.0
+        self.ready = False
+
+        self.running = False
+        self.update_thread = None
+        self.start_update_thread()
+
+    def beat(self):
+        """Call once per frame from the render loop"""
+        now = time.monotonic()
+        if self.stall_reported == self.frames:
+            duration = now - self.last_beat
+            self.log.info(f"stall ended after {duration:.3f}s")
+            print(f"Render loop stalled for {duration:.2f}s in '{self.stall_stage}'")
+        self.last_beat = now
+        self.frames += 1
+        if not self.ready:
+            self.ready = True
+            sd_notify("READY=1")
+
+    def _check(self):
+        now = time.monotonic()
+        frames = self.frames
+        stalled_for = now - self.last_beat
+        if stalled_for > self.stall_threshold:
+            if self.stall_reported != frames:
+                self.stall_reported = frames
+                self.stalls += 1
+                self._record_stall(stalled_for, now)
+        elif self.notify_interval is not None and now - self.last_notify >= self.notify_interval:
+            # Only vouch for the process while frames are flowing
+            sd_notify("WATCHDOG=1")
+            self.last_notify = now
+
+    def _record_stall(self, stalled_for, now):
+        self.stall_stage = self.stage.name
+        frame = sys._current_frames().get(self.main_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame is not None else '(no main thread)\n'
+        self.log.info(f"stall #{self.stalls}: no frame for {stalled_for:.3f}s, stage '{self.stall_stage}' "
+                      f"for {now - self.stage.since:.3f}s, frame {self.frames}\n{stack}")
+
+    def _update_loop(self):
+        """Thread function that watches the heartbeat"""
+        while self.running:
+            self._check()
+            time.sleep(self.check_interval)
+
+    def start_update_thread(self):
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop, name="watchdog")
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        self.running = False
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
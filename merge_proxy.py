@@ -0,0 +1,370 @@
+import argparse
+import select
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+import numpy as np
+from e131 import (ACN_PORT, DEFAULT_PRIORITY, HEADER_SIZE, OPTION_PREVIEW, OPTION_STREAM_TERMINATED,
+                  DirectSender, build_data_packet, open_receiver, parse_data_packet)
+
+# Art-Net ArtDmx packets, as built by create_artnet_packet in the BeagleBone scripts:
+# ID, OpCode (little-endian), protocol version, sequence, physical, port address (little-endian), length
+ARTNET_PORT = 6454
+ARTNET_ID = b'Art-Net\x00'
+ARTNET_OP_DMX = 0x5000
+ARTDMX_HEADER = struct.Struct('<8sHHBBH')
+ARTDMX_HEADER_SIZE = ARTDMX_HEADER.size + 2  # 18, with the big-endian length
+MERGE_CID = uuid.uuid5(uuid.NAMESPACE_DNS, 'futuresketch-merge').bytes
+
+
+def parse_artdmx(packet):
+    """
+    :return: (universe, sequence, data memoryview into packet), or None if it is not an ArtDmx packet
+    """
+    if len(packet) < ARTDMX_HEADER_SIZE:
+        return None
+    packet_id, opcode, _, sequence, _, universe = ARTDMX_HEADER.unpack_from(packet, 0)
+    if packet_id != ARTNET_ID or opcode != ARTNET_OP_DMX:
+        return None
+    length = min(int.from_bytes(packet[16:18], 'big'), len(packet) - ARTDMX_HEADER_SIZE, 512)
+    return universe & 0x7FFF, sequence, memoryview(packet)[ARTDMX_HEADER_SIZE:ARTDMX_HEADER_SIZE + length]
+
+
+class MergeProxy:
+    def __init__(self, controller_ip, controller_port=ACN_PORT, sacn_port=ACN_PORT, artnet_port=ARTNET_PORT,
+                 bind_address='', universes=(), artnet_priority=DEFAULT_PRIORITY, artnet_universe_offset=1,
+                 source_timeout=2.5, keepalive_interval=1.0, source_name="FutureSketch merge"):
+        """
+        Receives sACN and Art-Net from several renderers and forwards one merged
+        sACN stream to the controller. Point each renderer's receiver 'ip' at the
+        proxy instead of the Pixlite.
+
+        Per universe, only sources at the highest priority present take part,
+        and they are merged highest-takes-precedence (per channel maximum), so two
+        boards drawing on the same panel both show. A universe is merged and
+        forwarded as soon as a packet for it arrives, and only if the merged
+        data changed; unchanged universes are repeated every keepalive_interval
+        so the controller does not time them out.
+
+        :param controller_ip: Address to forward the merged stream to
+        :param sacn_port: Port to receive sACN on (None to not listen for sACN)
+        :param artnet_port: Port to receive Art-Net on (None to not listen for Art-Net)
+        :param universes: sACN universes to join the multicast groups of (unicast needs none)
+        :param artnet_priority: Priority given to Art-Net sources, which carry none
+        :param artnet_universe_offset: Added to Art-Net universes (0-based) to give sACN universes (1-based)
+        :param source_timeout: Seconds after its last packet that a source stops counting
+        """
+        self.controller = (controller_ip, controller_port)
+        self.artnet_priority = artnet_priority
+        self.artnet_universe_offset = artnet_universe_offset
+        self.source_timeout = source_timeout
+        self.keepalive_interval = keepalive_interval
+        self.source_name = source_name
+
+        # universe -> {source key: {'data', 'length', 'priority', 'seen', 'sequence'}}
+        self.sources = {}
+        # universe -> {'data', 'scratch', 'length', 'sequence', 'sent'} for the forwarded stream
+        self.outputs = {}
+        self.lock = threading.Lock()
+
+        self.sockets = []
+        if sacn_port is not None:
+            self.sacn_sock = open_receiver(sacn_port, bind_address, universes)
+            self.sockets.append(self.sacn_sock)
+        else:
+            self.sacn_sock = None
+        if artnet_port is not None:
+            self.artnet_sock = open_receiver(artnet_port, bind_address)
+            self.sockets.append(self.artnet_sock)
+        else:
+            self.artnet_sock = None
+        self.out_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receive_buffer = bytearray(2048)
+        self.send_buffer = bytearray(HEADER_SIZE + 512)
+
+        self.received = 0
+        self.forwarded = 0
+        self.unchanged = 0
+        self.dropped = 0
+        # Seconds from a packet arriving to its merged universe leaving
+        self.latencies = deque(maxlen=10000)
+
+        self.running = False
+        self.update_thread = None
+
+    def _update_source(self, universe, key, data, priority, sequence, arrived):
+        """Store a source's data for a universe. False if the packet is out of order."""
+        sources = self.sources.setdefault(universe, {})
+        source = sources.get(key)
+        if source is None:
+            source = sources[key] = {'data': np.zeros(512, dtype=np.uint8), 'length': 0, 'sequence': None}
+            print(f"Merge: new source {key[0]} on universe {universe}")
+        elif source['sequence'] is not None and sequence is not None:
+            # E1.31 6.7.2: a packet up to 20 behind the last one is late and is dropped
+            behind = (source['sequence'] - sequence) & 0xFF
+            if behind < 20:
+                return False
+        length = len(data)
+        source['data'][:length] = data
+        if length < source['length']:
+            source['data'][length:source['length']] = 0
+        source['length'] = length
+        source['priority'] = priority
+        source['sequence'] = sequence
+        source['seen'] = arrived
+        return True
+
+    def _remove_source(self, universe, key):
+        sources = self.sources.get(universe)
+        if sources is not None and sources.pop(key, None) is not None:
+            print(f"Merge: source {key[0]} left universe {universe}")
+
+    def handle_sacn(self, packet, address, arrived):
+        packet = parse_data_packet(packet)
+        if packet is None or packet.options & OPTION_PREVIEW:
+            return
+        key = (address, packet.cid)
+        if packet.options & OPTION_STREAM_TERMINATED:
+            self._remove_source(packet.universe, key)
+        elif not self._update_source(packet.universe, key, packet.data, packet.priority, packet.sequence, arrived):
+            self.dropped += 1
+            return
+        self.merge(packet.universe, arrived)
+
+    def handle_artnet(self, packet, address, arrived):
+        packet = parse_artdmx(packet)
+        if packet is None:
+            return
+        universe, sequence, data = packet
+        universe += self.artnet_universe_offset
+        # Art-Net sequence 0 means sequencing is off
+        if not self._update_source(universe, (address, 'artnet'), data, self.artnet_priority, sequence or None,
+                                   arrived):
+            self.dropped += 1
+            return
+        self.merge(universe, arrived)
+
+    def merge(self, universe, arrived=None, force=False):
+        """
+        Merge a universe's sources and forward the result if it changed (or force).
+        """
+        sources = self.sources.get(universe)
+        output = self.outputs.get(universe)
+        if not sources:
+            if output is not None:
+                # Nobody draws on this universe any more: end the stream rather than hold the last frame
+                del self.outputs[universe]
+                self._send(universe, output, OPTION_STREAM_TERMINATED)
+            return
+        if output is None:
+            output = self.outputs[universe] = {'data': np.zeros(512, dtype=np.uint8),
+                                               'scratch': np.zeros(512, dtype=np.uint8),
+                                               'length': 0, 'sequence': 0, 'sent': 0.0}
+        top = max(source['priority'] for source in sources.values())
+        merged = output['scratch']
+        merged.fill(0)
+        length = 0
+        for source in sources.values():
+            if source['priority'] == top:
+                np.maximum(merged, source['data'], out=merged)
+                length = max(length, source['length'])
+
+        if not force and length == output['length'] and np.array_equal(merged, output['data']):
+            self.unchanged += 1
+            return
+        output['data'], output['scratch'] = merged, output['data']
+        output['length'] = length
+        self._send(universe, output)
+        if arrived is not None:
+            self.latencies.append(time.perf_counter() - arrived)
+
+    def _send(self, universe, output, options=0):
+        packet = build_data_packet(universe, memoryview(output['data'])[:output['length']], output['sequence'],
+                                   DEFAULT_PRIORITY, self.source_name, MERGE_CID, options, out=self.send_buffer)
+        output['sequence'] = (output['sequence'] + 1) & 0xFF
+        output['sent'] = time.perf_counter()
+        try:
+            self.out_sock.sendto(packet, self.controller)
+            self.forwarded += 1
+        except OSError as e:
+            print(f"Merge: error forwarding universe {universe}: {e}")
+
+    def expire(self, now=None):
+        """Drop sources that have gone quiet and repeat universes due a keepalive"""
+        now = time.perf_counter() if now is None else now
+        for universe in list(self.sources):
+            sources = self.sources[universe]
+            for key in [key for key, source in sources.items() if now - source['seen'] > self.source_timeout]:
+                self._remove_source(universe, key)
+            output = self.outputs.get(universe)
+            if not sources:
+                del self.sources[universe]
+                self.merge(universe)
+            elif output is not None and now - output['sent'] >= self.keepalive_interval:
+                self.merge(universe, force=True)
+
+    def _update_loop(self):
+        """Thread function that receives, merges and forwards"""
+        last_expire = time.perf_counter()
+        while self.running:
+            try:
+                ready, _, _ = select.select(self.sockets, [], [], 0.1)
+            except (OSError, ValueError):
+                break
+            for sock in ready:
+                try:
+                    size, address = sock.recvfrom_into(self.receive_buffer)
+                except OSError:
+                    continue
+                arrived = time.perf_counter()
+                self.received += 1
+                packet = memoryview(self.receive_buffer)[:size]
+                with self.lock:
+                    if sock is self.sacn_sock:
+                        self.handle_sacn(packet, address, arrived)
+                    else:
+                        self.handle_artnet(packet, address, arrived)
+            now = time.perf_counter()
+            if now - last_expire >= 0.1:
+                with self.lock:
+                    self.expire(now)
+                last_expire = now
+
+    def start_update_thread(self):
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop, name="merge")
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        self.running = False
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
+
+    def close(self):
+        self.stop_update_thread()
+        for sock in self.sockets + [self.out_sock]:
+            sock.close()
+
+    def get_stats(self):
+        """Packet counts and the merge-and-forward latency percentiles in milliseconds"""
+        with self.lock:
+            stats = {'received': self.received, 'forwarded': self.forwarded, 'unchanged': self.unchanged,
+                     'dropped': self.dropped,
+                     'sources': {universe: len(sources) for universe, sources in self.sources.items()}}
+            latencies = np.array(self.latencies)
+        if len(latencies):
+            stats['latency_ms'] = dict(zip(('p50', 'p99', 'max'),
+                                           (1000 * np.append(np.percentile(latencies, [50, 99]),
+                                                             latencies.max())).tolist()))
+        return stats
+
+
+def artdmx_packet(universe, data, sequence=0):
+    """ArtDmx packet, as the BeagleBone scripts send"""
+    return (ARTDMX_HEADER.pack(ARTNET_ID, ARTNET_OP_DMX, 14, sequence, 0, universe)
+            + len(data).to_bytes(2, 'big') + bytes(data))
+
+
+def run_standins(duration=5.0, universe_count=4, fps=40, sacn_port=5570, artnet_port=6455, output_port=5571):
+    """
+    Run the proxy on localhost between two stand-in renderers (one sACN, one
+    Art-Net, each sweeping a bar of its own colour) and a stand-in controller,
+    then check the controller's last frame is the per-channel maximum of both.
+    """
+    universes = list(range(1, universe_count + 1))
+    proxy = MergeProxy('127.0.0.1', output_port, sacn_port, artnet_port, bind_address='127.0.0.1')
+    controller = open_receiver(output_port, '127.0.0.1', timeout=0.1)
+    received = {}
+    stop = threading.Event()
+
+    def receive():
+        buffer = bytearray(HEADER_SIZE + 512)
+        while not stop.is_set():
+            try:
+                size = controller.recv_into(buffer)
+            except socket.timeout:
+                continue
+            packet = parse_data_packet(buffer[:size])
+            if packet is not None and not packet.options & OPTION_STREAM_TERMINATED:
+                received[packet.universe] = bytes(packet.data)
+
+    sacn_sender = DirectSender(source_name="stand-in A", cid=uuid.uuid4().bytes, port=sacn_port)
+    for universe in universes:
+        sacn_sender.activate_output(universe)
+        sacn_sender[universe].destination = '127.0.0.1'
+    artnet_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    proxy.start_update_thread()
+    frame_a = frame_b = None
+    try:
+        start = time.time()
+        frame = 0
+        while time.time() - start < duration:
+            # A: red bar moving along the pixels; B: blue bar moving the other way
+            pixels = universe_count * 170
+            frame_a = np.zeros((pixels, 3), dtype=np.uint8)
+            frame_b = np.zeros((pixels, 3), dtype=np.uint8)
+            frame_a[(frame * 7) % pixels:(frame * 7) % pixels + 40, 0] = 255
+            frame_b[-((frame * 5) % pixels) - 40:pixels - (frame * 5) % pixels, 2] = 200
+            frame_a[::50] = 30
+            for i, universe in enumerate(universes):
+                sacn_sender[universe].dmx_data = frame_a[i * 170:(i + 1) * 170].tobytes()
+                artnet_sock.sendto(artdmx_packet(universe - 1, frame_b[i * 170:(i + 1) * 170].tobytes(),
+                                                 frame % 255 + 1), ('127.0.0.1', artnet_port))
+            frame += 1
+            time.sleep(1 / fps)
+        time.sleep(0.2)
+    finally:
+        proxy.stop_update_thread()
+        stop.set()
+        receiver.join()
+        sacn_sender.stop()
+        artnet_sock.close()
+        controller.close()
+        proxy.close()
+
+    expected = np.maximum(frame_a, frame_b)
+    matches = all(received.get(universe) == expected[i * 170:(i + 1) * 170].tobytes()
+                  for i, universe in enumerate(universes))
+    stats = proxy.get_stats()
+    print(f"Stand-ins: {frame} frames per source over {duration:.0f}s, {len(universes)} universes")
+    print(f"Proxy: {stats}")
+    print(f"Controller's last frame is the HTP merge of both sources: {matches}")
+    return matches, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge sACN/Art-Net from several renderers into one stream")
+    parser.add_argument("controller", nargs="?", help="IP of the Pixlite to forward to")
+    parser.add_argument("--universes", type=int, nargs="*", default=[],
+                        help="sACN universes to receive by multicast (unicast needs none)")
+    parser.add_argument("--artnet-priority", type=int, default=DEFAULT_PRIORITY)
+    parser.add_argument("--no-artnet", action="store_true")
+    parser.add_argument("--standin", action="store_true",
+                        help="run against local stand-in renderers and controller instead")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.standin:
+        run_standins(args.duration)
+    elif not args.controller:
+        parser.error("controller IP required (or --standin)")
+    else:
+        proxy = MergeProxy(args.controller, universes=args.universes, artnet_priority=args.artnet_priority,
+                           artnet_port=None if args.no_artnet else ARTNET_PORT)
+        proxy.start_update_thread()
+        try:
+            while True:
+                time.sleep(10)
+                print(proxy.get_stats())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            proxy.close()
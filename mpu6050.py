@@ -0,0 +1,254 @@
+import threading
+import time
+import numpy as np
+
+# MPU6050 registers
+MPU6050_ADDR = 0x68
+SMPLRT_DIV = 0x19
+CONFIG = 0x1A
+ACCEL_CONFIG = 0x1C
+FIFO_EN = 0x23
+INT_STATUS = 0x3A
+ACCEL_XOUT_H = 0x3B
+USER_CTRL = 0x6A
+PWR_MGMT_1 = 0x6B
+FIFO_COUNTH = 0x72
+FIFO_R_W = 0x74
+
+ACCEL_FIFO_EN = 0x08
+USER_FIFO_EN = 0x40
+USER_FIFO_RESET = 0x04
+INT_FIFO_OFLOW = 0x10
+
+SAMPLE_BYTES = 6         # X, Y, Z as big-endian int16
+MAX_BLOCK_READ = 30      # SMBus block reads top out at 32 bytes; keep whole samples
+FIFO_SIZE = 1024
+
+
+class MPU6050:
+    def __init__(self, bus, address=MPU6050_ADDR, sample_rate=200, buffer_size=1024,
+                 use_fifo=True, poll_interval=0.02, shake_threshold=10000, detector=None):
+        """
+        Accelerometer driver for the MPU6050 shake sensor. Samples are read in
+        bursts (one block read per axis triple, or per FIFO chunk) on a background
+        thread and kept in a numpy ring buffer, so the render loop only has to
+        check whether a shake happened.
+
+        Args:
+            bus: smbus2.SMBus (or FakeSMBus) instance
+            address: I2C address of the sensor
+            sample_rate: Sensor sample rate in Hz (4-1000)
+            buffer_size: Number of samples kept in the ring buffer
+            use_fifo: Let the sensor buffer samples in its FIFO and drain it in bursts
+            poll_interval: Seconds between drains of the FIFO (or between direct reads without it)
+            shake_threshold: Summed per-axis change between consecutive samples that counts as a shake
+                (only used without a detector)
+            detector: Optional ShakeDetector fed with every drained batch instead of the plain threshold
+        """
+        self.bus = bus
+        self.address = address
+        self.sample_rate = sample_rate
+        self.use_fifo = use_fifo
+        self.poll_interval = poll_interval if use_fifo else min(poll_interval, 1.0 / sample_rate)
+        self.shake_threshold = shake_threshold
+        self.detector = detector
+
+        # Ring buffer of raw samples, plus the receive time of each one
+        self.samples = np.zeros((buffer_size, 3), dtype=np.int16)
+        self.times = np.zeros(buffer_size)
+        self.sample_count = 0
+        self.overflows = 0
+        self.last_sample = None
+        self.shaken = threading.Event()
+
+        self.running = False
+        self.update_thread = None
+        self.lock = threading.Lock()
+
+        self.configure()
+
+    def configure(self):
+        """
+        Wake the sensor, set the sample rate and, if enabled, route the
+        accelerometer into the FIFO.
+        """
+        self.bus.write_byte_data(self.address, PWR_MGMT_1, 0)
+        # DLPF on (CONFIG=1) gives a 1 kHz internal rate, divided down by SMPLRT_DIV
+        self.bus.write_byte_data(self.address, CONFIG, 1)
+        divider = max(0, min(255, int(round(1000 / self.sample_rate)) - 1))
+        self.bus.write_byte_data(self.address, SMPLRT_DIV, divider)
+        self.bus.write_byte_data(self.address, ACCEL_CONFIG, 0)  # +-2g
+        if self.use_fifo:
+            self.bus.write_byte_data(self.address, USER_CTRL, USER_FIFO_RESET)
+            self.bus.write_byte_data(self.address, FIFO_EN, ACCEL_FIFO_EN)
+            self.bus.write_byte_data(self.address, USER_CTRL, USER_FIFO_EN)
+        else:
+            self.bus.write_byte_data(self.address, FIFO_EN, 0)
+            self.bus.write_byte_data(self.address, USER_CTRL, 0)
+
+    def read_acceleration(self):
+        """
+        Read X, Y, Z in one 6-byte burst.
+        """
+        raw = bytes(self.bus.read_i2c_block_data(self.address, ACCEL_XOUT_H, SAMPLE_BYTES))
+        return tuple(int(v) for v in np.frombuffer(raw, dtype='>i2'))
+
+    def _read_fifo(self):
+        """Drain whole samples from the sensor FIFO; returns an (N, 3) int16 array"""
+        status = self.bus.read_byte_data(self.address, INT_STATUS)
+        if status & INT_FIFO_OFLOW:
+            # Samples were lost; restart the FIFO so it is aligned on a sample boundary again
+            self.overflows += 1
+            self.bus.write_byte_data(self.address, USER_CTRL, USER_FIFO_EN | USER_FIFO_RESET)
+            return np.zeros((0, 3), dtype=np.int16)
+
+        high, low = self.bus.read_i2c_block_data(self.address, FIFO_COUNTH, 2)
+        available = ((high << 8) | low) // SAMPLE_BYTES * SAMPLE_BYTES
+        raw = bytearray()
+        while len(raw) < available:
+            chunk = min(MAX_BLOCK_READ, available - len(raw))
+            raw.extend(self.bus.read_i2c_block_data(self.address, FIFO_R_W, chunk))
+        return np.frombuffer(bytes(raw), dtype='>i2').reshape(-1, 3).astype(np.int16)
+
+    def _store(self, batch, now):
+        """Append a batch to the ring buffer and flag a shake if one is detected in it"""
+        if len(batch) == 0:
+            return
+        with self.lock:
+            size = len(self.samples)
+            if len(batch) >= size:
+                batch = batch[-size:]
+            index = (self.sample_count + np.arange(len(batch))) % size
+            self.samples[index] = batch
+            # Spread the batch back over the time it took to accumulate
+            times = now - (len(batch) - 1 - np.arange(len(batch))) / self.sample_rate
+            self.times[index] = times
+            self.sample_count += len(batch)
+
+        if self.detector is not None:
+            if self.detector.process(batch, times):
+                self.shaken.set()
+            return
+
+        series = batch.astype(np.int32)
+        if self.last_sample is not None:
+            series = np.vstack([self.last_sample, series])
+        self.last_sample = series[-1]
+        if len(series) > 1 and (np.abs(np.diff(series, axis=0)).sum(axis=1) > self.shake_threshold).any():
+            self.shaken.set()
+
+    def poll(self):
+        """
+        Read whatever is available and store it. Called by the background thread,
+        or directly when running without it.
+        """
+        if self.use_fifo:
+            batch = self._read_fifo()
+        else:
+            batch = np.array([self.read_acceleration()], dtype=np.int16)
+        self._store(batch, time.time())
+        return len(batch)
+
+    def _update_loop(self):
+        """Thread function that keeps draining the sensor"""
+        while self.running:
+            try:
+                self.poll()
+            except OSError as e:
+                print(f"Accelerometer read error: {e}")
+            time.sleep(self.poll_interval)
+
+    def start_update_thread(self):
+        """Start the background sampling thread"""
+        if not self.running:
+            self.running = True
+            self.update_thread = threading.Thread(target=self._update_loop)
+            self.update_thread.daemon = True  # Thread will exit when main program exits
+            self.update_thread.start()
+
+    def stop_update_thread(self):
+        """Stop the background sampling thread"""
+        self.running = False
+        if self.update_thread:
+            self.update_thread.join(timeout=1.0)
+
+    def get_samples(self, count=None):
+        """
+        Returns the most recent samples, oldest first, as (samples, times).
+        """
+        with self.lock:
+            available = min(self.sample_count, len(self.samples))
+            count = available if count is None else min(count, available)
+            index = (self.sample_count - count + np.arange(count)) % len(self.samples)
+            return self.samples[index].copy(), self.times[index].copy()
+
+    def save_trace(self, path):
+        """
+        Save the buffered samples as an (N, 4) array of x, y, z, time for tuning
+        the shake detector offline.
+        """
+        samples, times = self.get_samples()
+        np.save(path, np.column_stack([samples, times]))
+
+    def consume_shake(self):
+        """
+        Returns True once per detected shake.
+        """
+        if self.shaken.is_set():
+            self.shaken.clear()
+            return True
+        return False
+
+
+class FakeSMBus:
+    def __init__(self):
+        """
+        Stand-in for smbus2.SMBus that emulates the MPU6050 registers and FIFO,
+        so the driver can run without the sensor attached.
+        """
+        self.registers = {}
+        self.fifo = bytearray()
+        self.lock = threading.Lock()
+
+    def set_acceleration(self, x, y, z):
+        """Set the values returned by a direct ACCEL_XOUT_H burst read"""
+        raw = np.array([x, y, z], dtype='>i2').tobytes()
+        for i, value in enumerate(raw):
+            self.registers[ACCEL_XOUT_H + i] = value
+
+    def push_samples(self, samples):
+        """Queue (N, 3) samples in the emulated FIFO"""
+        with self.lock:
+            self.fifo.extend(np.asarray(samples, dtype='>i2').tobytes())
+            if len(self.fifo) > FIFO_SIZE:
+                del self.fifo[:len(self.fifo) - FIFO_SIZE]
+                self.registers[INT_STATUS] = self.registers.get(INT_STATUS, 0) | INT_FIFO_OFLOW
+
+    def write_byte_data(self, address, register, value):
+        with self.lock:
+            self.registers[register] = value
+            if register == USER_CTRL and value & USER_FIFO_RESET:
+                self.fifo.clear()
+                self.registers[INT_STATUS] = self.registers.get(INT_STATUS, 0) & ~INT_FIFO_OFLOW
+
+    def read_byte_data(self, address, register):
+        with self.lock:
+            value = self.registers.get(register, 0)
+            if register == INT_STATUS:
+                # Reading INT_STATUS clears it on the real chip
+                self.registers[INT_STATUS] = 0
+            return value
+
+    def read_i2c_block_data(self, address, register, length):
+        with self.lock:
+            if register == FIFO_R_W:
+                data = list(self.fifo[:length])
+                del self.fifo[:length]
+                return data + [0] * (length - len(data))
+            if register == FIFO_COUNTH:
+                count = len(self.fifo)
+                return [count >> 8, count & 0xFF][:length]
+            return [self.registers.get(register + i, 0) for i in range(length)]
+
+    def close(self):
+        pass
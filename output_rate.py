@@ -0,0 +1,108 @@
+import time
+import numpy as np
+
+
+class AdaptiveOutputRate:
+    def __init__(self, keepalive_interval=1.0, idle_after=1.0):
+        """
+        Decides, at each send point, whether a frame needs to go out. While the
+        canvas keeps changing every frame is sent; once it has been unchanged for
+        idle_after seconds (faded to black, a static gallery image) only a
+        keepalive frame goes out every keepalive_interval seconds. The first
+        change or input goes straight back to full rate.
+
+        :param keepalive_interval: Seconds between repeats of an unchanged frame
+        :param idle_after: Seconds without change before dropping to the keepalive rate
+        """
+        self.keepalive_interval = keepalive_interval
+        self.idle_after = idle_after
+        self.last_frame = None
+        self.last_change = None
+        self.last_sent = 0.0
+        self.idle = False
+        self.mode_since = None
+        self.started = None
+        self.idle_time = 0.0
+        self.offered = 0
+        self.sent = 0
+
+    def wake(self, now=None):
+        """Input arrived: return to full rate even before the canvas changes"""
+        now = time.time() if now is None else now
+        if self.started is None:
+            self.started = self.mode_since = now
+        self.last_change = now
+        if self.idle:
+            self._set_idle(False, now)
+
+    def _set_idle(self, idle, now):
+        if self.idle:
+            self.idle_time += now - self.mode_since
+        duration = now - self.mode_since
+        self.idle = idle
+        self.mode_since = now
+        if idle:
+            print(f"Output idle after {duration:.0f}s of changes, {self.keepalive_interval:.1f}s keepalive "
+                  f"(duty cycle so far {100 * self.get_stats(now)['duty']:.0f}%)")
+        else:
+            print(f"Output back to full rate after {duration:.0f}s idle")
+
+    def should_send(self, frame, dirty=None, now=None):
+        """
+        :param frame: uint8 frame about to be sent
+        :param dirty: True/False if the caller already knows whether the frame
+                      changed since the last one sent; None to compare
+        :return: True if the frame should be sent now
+        """
+        now = time.time() if now is None else now
+        if self.started is None:
+            self.started = self.mode_since = self.last_change = now
+        self.offered += 1
+        if dirty is None:
+            dirty = self.last_frame is None or not np.array_equal(frame, self.last_frame)
+        if dirty:
+            self.last_change = now
+            if self.idle:
+                self._set_idle(False, now)
+        elif not self.idle and now - self.last_change >= self.idle_after:
+            self._set_idle(True, now)
+
+        if self.idle and now - self.last_sent < self.keepalive_interval:
+            return False
+        if self.last_frame is None or self.last_frame.shape != frame.shape:
+            self.last_frame = np.empty_like(frame)
+        np.copyto(self.last_frame, frame)
+        self.last_sent = now
+        self.sent += 1
+        return True
+
+    def get_stats(self, now=None):
+        """
+        Sends offered and made, duty cycle (fraction of send points that sent),
+        and the fraction of time spent at the keepalive rate.
+        """
+        now = time.time() if now is None else now
+        if self.started is None:
+            return {'offered': 0, 'sent': 0, 'duty': 1.0, 'idle_fraction': 0.0, 'idle': False}
+        idle_time = self.idle_time + (now - self.mode_since if self.idle else 0.0)
+        return {
+            'offered': self.offered,
+            'sent': self.sent,
+            'duty': self.sent / self.offered if self.offered else 1.0,
+            'idle_fraction': idle_time / max(now - self.started, 1e-9),
+            'idle': self.idle,
+        }
+
+
+def frame_to_send(canvas, output_rate):
+    """
+    The render loop's send step, shared by FS.py and latency_trace.py: bring the
+    DirtyCanvas output up to date and let the output rate decide whether it goes out.
+
+    :return: (uint8 frame, changed rectangles or None to send every universe), or None to skip this send
+    """
+    frame, dirty = canvas.take_dirty()
+    if not output_rate.should_send(frame, dirty=bool(dirty)):
+        return None
+    # Keepalives and resends after a wake go out in full
+    return frame, dirty or None
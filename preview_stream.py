@@ -0,0 +1,149 @@
+import base64
+import struct
+import threading
+import time
+import numpy as np
+
+# Delta message: header, then one run record per changed pixel run
+DELTA_HEADER = struct.Struct('<IHHI')  # frame id, width, height, run count
+RUN_HEADER = struct.Struct('<II')      # first pixel index (row-major), pixel count; followed by count*3 RGB bytes
+
+
+def changed_runs(previous, current, merge_gap=2):
+    """
+    Find runs of changed pixels between two frames in row-major order.
+
+    :param previous: (H, W, 3) frame the client already has, or None for a full frame
+    :param current: (H, W, 3) uint8 frame to send
+    :param merge_gap: Unchanged gaps up to this many pixels are sent anyway to save run headers
+    :return: (starts, lengths) arrays of pixel indices
+    """
+    pixel_count = current.shape[0] * current.shape[1]
+    if previous is None:
+        return np.array([0]), np.array([pixel_count])
+    changed = np.any(previous != current, axis=2).ravel()
+    if not changed.any():
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    edges = np.diff(np.concatenate([[0], changed.view(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if merge_gap > 0 and len(starts) > 1:
+        keep = np.concatenate([[True], starts[1:] - ends[:-1] > merge_gap])
+        starts = starts[keep]
+        ends = np.concatenate([ends[:-1][keep[1:]], ends[-1:]])
+    return starts, ends - starts
+
+
+def encode_delta(previous, current, frame_id, merge_gap=2):
+    """
+    Encode the difference between two frames as a binary delta message.
+    """
+    starts, lengths = changed_runs(previous, current, merge_gap)
+    flat = current.reshape(-1, 3)
+    parts = [DELTA_HEADER.pack(frame_id & 0xFFFFFFFF, current.shape[1], current.shape[0], len(starts))]
+    for start, length in zip(starts.tolist(), lengths.tolist()):
+        parts.append(RUN_HEADER.pack(start, length))
+        parts.append(flat[start:start + length].tobytes())
+    return b''.join(parts)
+
+
+class PreviewBroadcaster:
+    def __init__(self, height, width, max_fps=30, keepalive=15.0):
+        """
+        Fan the live canvas out to any number of preview clients as a stream of
+        binary deltas (Server-Sent Events, base64 payload). The drawing loop only
+        copies the finished frame into a buffer; each client works out its own
+        delta against what it was last sent, at its own pace.
+
+        :param height: Canvas rows
+        :param width: Canvas columns
+        :param max_fps: Highest rate at which any single client is sent frames
+        :param keepalive: Seconds of silence after which a comment is sent to keep the connection open
+        """
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.frame_id = 0
+        self.max_fps = max_fps
+        self.keepalive = keepalive
+        self.clients = 0
+        self.condition = threading.Condition()
+
+    def publish(self, pixels):
+        """
+        Make a new frame available to clients. Called once per frame by the drawing loop.
+        """
+        with self.condition:
+            np.copyto(self.frame, pixels, casting='unsafe')
+            self.frame_id += 1
+            self.condition.notify_all()
+
+    def _snapshot(self, last_id, timeout):
+        with self.condition:
+            if self.frame_id == last_id:
+                self.condition.wait(timeout)
+            if self.frame_id == last_id:
+                return last_id, None
+            return self.frame_id, self.frame.copy()
+
+    def stream(self, max_fps=None):
+        """
+        Generator of SSE messages for one client. The first message is a full
+        frame; later ones only carry the runs that changed.
+        """
+        interval = 1.0 / min(max_fps or self.max_fps, self.max_fps)
+        last_id = -1
+        last_frame = None
+        last_sent = 0.0
+        with self.condition:
+            self.clients += 1
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                # Rate limit per client before looking at the frame, so a slow
+                # client never causes extra work for the drawing loop
+                wait = last_sent + interval - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                frame_id, frame = self._snapshot(last_id, self.keepalive)
+                if frame is None:
+                    yield ": keepalive\n\n"
+                    continue
+                message = encode_delta(last_frame, frame, frame_id)
+                last_id, last_frame, last_sent = frame_id, frame, time.time()
+                yield f"data: {base64.b64encode(message).decode()}\n\n"
+        finally:
+            with self.condition:
+                self.clients -= 1
+
+
+# Browser side of the stream: decodes delta messages into an ImageData and draws it to a <canvas>
+PREVIEW_SCRIPT = """
+const canvas = document.getElementById('preview');
+const ctx = canvas.getContext('2d');
+let image = null;
+const source = new EventSource('/stream');
+source.onmessage = (event) => {
+    const raw = atob(event.data);
+    const bytes = new Uint8Array(raw.length);
+    for (let i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+    const view = new DataView(bytes.buffer);
+    const width = view.getUint16(4, true), height = view.getUint16(6, true), runs = view.getUint32(8, true);
+    if (!image || image.width !== width || image.height !== height) {
+        canvas.width = width;
+        canvas.height = height;
+        image = ctx.createImageData(width, height);
+        for (let i = 3; i < image.data.length; i += 4) image.data[i] = 255;
+    }
+    let offset = 12;
+    for (let r = 0; r < runs; r++) {
+        const start = view.getUint32(offset, true), count = view.getUint32(offset + 4, true);
+        offset += 8;
+        for (let p = 0; p < count; p++) {
+            const o = (start + p) * 4;
+            image.data[o] = bytes[offset++];
+            image.data[o + 1] = bytes[offset++];
+            image.data[o + 2] = bytes[offset++];
+        }
+    }
+    ctx.putImageData(image, 0, 0);
+};
+"""
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import numpy as np
+from ImageToDMX import indices_from_layout
+
+UNIVERSE_SIZE = 170
+# WS2811/WS2812 data rate: 24 bits at 800 kHz per pixel
+PIXEL_TIME = 30e-6
+DEFAULT_MAX_PIXELS_PER_OUTPUT = 680  # ~20 ms per output refresh
+
+# Example receivers.json:
+# {
+#   "start_universe": 1,
+#   "max_pixels_per_output": 680,
+#   "controllers": [
+#     {
+#       "name": "pixlite-1",
+#       "ip": "192.168.68.111",
+#       "outputs": 4,
+#       "regions": [
+#         {"name": "top-left", "serpentine": [0, 0, 31, 19]},
+#         {"name": "rest", "layout": "layout.txt"}
+#       ]
+#     }
+#   ]
+# }
+# A region is a chain of pixels wired in order: either a serpentine panel given as
+# [row_start, col_start, width, height], or a layout file in the layout.txt format.
+
+
+def serpentine_lines(row_start, col_start, width, height):
+    """Layout lines for a serpentine panel, as written by Make_config.py"""
+    return [[row_start + row, col_start, width if row % 2 == 0 else -width] for row in range(height)]
+
+
+def region_lines(region, base_dir):
+    if 'serpentine' in region:
+        return serpentine_lines(*region['serpentine'])
+    if 'layout' in region:
+        path = os.path.join(base_dir, region['layout'])
+        return np.loadtxt(path, delimiter=',', ndmin=2).astype(int).tolist()
+    raise ValueError(f"Region {region.get('name', '?')} needs 'serpentine' or 'layout'")
+
+
+def split_chain(lines, max_pixels):
+    """
+    Split a region's layout lines into chunks of at most max_pixels, cutting only
+    between lines so each chunk still starts at the beginning of a pixel run.
+    """
+    chunks, current, count = [], [], 0
+    for line in lines:
+        length = abs(int(line[2]))
+        if length > max_pixels:
+            raise ValueError(f"Layout line {line} is longer than {max_pixels} pixels")
+        if current and count + length > max_pixels:
+            chunks.append((current, count))
+            current, count = [], 0
+        current.append(line)
+        count += length
+    if current:
+        chunks.append((current, count))
+    return chunks
+
+
+def balance_outputs(chunks, output_count, max_pixels):
+    """
+    Assign chunks to outputs, largest first onto the least loaded output, so the
+    slowest output (which sets the refresh rate) carries as few pixels as possible.
+
+    :param chunks: List of (name, lines, pixel count)
+    :return: Per output, the list of chunks assigned to it, in chunk order
+    """
+    loads = [0] * output_count
+    assigned = [[] for _ in range(output_count)]
+    for index in sorted(range(len(chunks)), key=lambda i: -chunks[i][2]):
+        output = min(range(output_count), key=lambda o: loads[o])
+        if loads[output] + chunks[index][2] > max_pixels:
+            raise ValueError(f"{sum(c[2] for c in chunks)} pixels do not fit on {output_count} outputs "
+                             f"of {max_pixels} pixels")
+        loads[output] += chunks[index][2]
+        assigned[output].append(index)
+    return [[chunks[i] for i in sorted(indices)] for indices in assigned]
+
+
+def compile_plan(config, base_dir="."):
+    """
+    Turn a receiver config into a plan: one entry per used controller output,
+    each starting on its own universe.
+
+    :return: List of dicts with controller, ip, output, universe, pixel_count, regions and lines
+    """
+    max_default = config.get('max_pixels_per_output', DEFAULT_MAX_PIXELS_PER_OUTPUT)
+    universe = config.get('start_universe', 1)
+    plan = []
+    for controller in config['controllers']:
+        max_pixels = controller.get('max_pixels_per_output', max_default)
+        chunks = []
+        for region in controller['regions']:
+            name = region.get('name', f"region{len(chunks)}")
+            for lines, count in split_chain(region_lines(region, base_dir), max_pixels):
+                chunks.append((name, lines, count))
+        for output, output_chunks in enumerate(balance_outputs(chunks, controller['outputs'], max_pixels)):
+            if not output_chunks:
+                continue
+            pixel_count = sum(c[2] for c in output_chunks)
+            plan.append({
+                'controller': controller.get('name', controller['ip']),
+                'ip': controller['ip'],
+                'output': output + 1,
+                'universe': universe,
+                'pixel_count': pixel_count,
+                'regions': [c[0] for c in output_chunks],
+                'lines': [line for c in output_chunks for line in c[1]],
+            })
+            universe += -(-pixel_count // UNIVERSE_SIZE)
+    return plan
+
+
+def save_plan(plan, path):
+    with open(path, 'w') as f:
+        json.dump(plan, f, indent=1)
+
+
+def load_plan(path):
+    """
+    Load a compiled plan as receiver dicts ready for SACNPixelSender.
+    """
+    with open(path) as f:
+        return plan_receivers(json.load(f))
+
+
+def plan_receivers(plan):
+    """Receiver dicts, with addressing arrays, for each output of a plan"""
+    receivers = []
+    for entry in plan:
+        receiver = dict(entry)
+        receiver['addressing_array'] = indices_from_layout(entry['lines'])
+        receivers.append(receiver)
+    return receivers
+
+
+def describe_plan(plan):
+    for entry in plan:
+        universes = -(-entry['pixel_count'] // UNIVERSE_SIZE)
+        refresh = entry['pixel_count'] * PIXEL_TIME * 1000
+        print(f"{entry['controller']} output {entry['output']}: {entry['pixel_count']} px, "
+              f"universes {entry['universe']}-{entry['universe'] + universes - 1}, "
+              f"{refresh:.1f} ms refresh ({', '.join(entry['regions'])})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a receiver config into a universe plan")
+    parser.add_argument("config", help="receiver config JSON")
+    parser.add_argument("-o", "--output", help="plan file to write (default: <config>.plan.json)")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    plan = compile_plan(config, os.path.dirname(os.path.abspath(args.config)))
+    describe_plan(plan)
+    output = args.output or os.path.splitext(args.config)[0] + ".plan.json"
+    save_plan(plan, output)
+    print(f"Wrote {output}")
@@ -0,0 +1,152 @@
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StageMarker:
+    __slots__ = ('name', 'since')
+
+    def __init__(self):
+        """
+        Names the part of the render loop currently running. Setting it is a
+        couple of attribute writes, so it can stay in the loop permanently;
+        the profiler tags samples with it and the watchdog reports it on a stall.
+        """
+        self.name = 'start'
+        self.since = time.monotonic()
+
+    def set(self, name):
+        self.name = name
+        self.since = time.monotonic()
+
+
+# Shared marker for FS.py's main loop
+loop_stage = StageMarker()
+
+
+def collapse_stack(frame):
+    """Stack of a frame as 'file:function' entries from the outermost call in"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, duration=30.0, output_dir="profiles", stage=loop_stage):
+        """
+        In-process sampling profiler for the running service. Nothing runs until
+        start(); then a thread samples every thread's stack each interval for at
+        most duration seconds and writes them as collapsed stacks (one
+        'thread;stage;frame;frame... count' line per stack, ready for
+        flamegraph.pl or speedscope).
+
+        :param interval: Seconds between samples
+        :param duration: Longest window a single start() records for
+        :param output_dir: Directory for the .folded files
+        :param stage: StageMarker whose name tags the main thread's samples
+        """
+        self.interval = interval
+        self.duration = duration
+        self.output_dir = output_dir
+        self.stage = stage
+        self.counts = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.path = None
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.counts = Counter()
+            self.samples = 0
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._sample_loop, name="profiler")
+            self.thread.daemon = True
+            self.thread.start()
+        print(f"Profiler started ({self.duration:.0f}s max, every {1000 * self.interval:.0f} ms)")
+
+    def stop(self):
+        """Stop sampling and write the profile; returns its path"""
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        return self.path
+
+    def toggle(self):
+        """Start, or stop without waiting (the sampling thread writes the profile itself)"""
+        if self.running:
+            self.stop_event.set()
+        else:
+            self.start()
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        main_id = threading.main_thread().ident
+        started = time.monotonic()
+        while not self.stop_event.wait(self.interval) and time.monotonic() - started < self.duration:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                prefix = [names.get(thread_id, str(thread_id))]
+                if thread_id == main_id:
+                    prefix.append(f"[{self.stage.name}]")
+                self.counts[';'.join(prefix + collapse_stack(frame))] += 1
+            self.samples += 1
+        self.path = self._write(time.monotonic() - started)
+
+    def _write(self, elapsed):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile_{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"Profiler wrote {self.samples} samples over {elapsed:.1f}s to {path}")
+        return path
+
+    def install_signal_handler(self, signum=signal.SIGUSR1):
+        """
+        Toggle the profiler with a signal, e.g. systemctl kill -s USR1 fs-script.service
+        """
+        signal.signal(signum, lambda signum, frame: self.toggle())
+
+
+if __name__ == "__main__":
+    # Summarise a profile: the hottest stages and functions (leaf frames)
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarise a collapsed-stack profile")
+    parser.add_argument("profile")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    stages, leaves = Counter(), Counter()
+    total = 0
+    with open(args.profile) as f:
+        for line in f:
+            stack, count = line.rsplit(' ', 1)
+            count = int(count)
+            frames = stack.split(';')
+            total += count
+            if len(frames) > 1 and frames[1].startswith('['):
+                stages[frames[1]] += count
+            leaves[frames[-1]] += count
+    print("Main loop stages:")
+    for name, count in stages.most_common():
+        print(f"  {100 * count / total:5.1f}%  {name}")
+    print("Hottest functions:")
+    for name, count in leaves.most_common(args.top):
+        print(f"  {100 * count / total:5.1f}%  {name}")
@@ -2,11 +2,23 @@ import os
 import numpy as np
 import cv2
 import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from canvas_format import load_capture
+from capture_index import auto_reject
 
-def scan_unfiltered_images():
+# Contact sheet cell size in screen pixels and the border drawn around decided cells
+CELL_WIDTH = 248
+CELL_HEIGHT = 152
+CELL_GAP = 4
+KEEP_COLOR = (0, 200, 0)      # BGR
+REJECT_COLOR = (0, 0, 220)    # BGR
+
+def scan_unfiltered_images(skip_auto_reject=False):
     """
-    Scan unfiltered_saves directory for .npz files, display each image, and
-    allow user to save (S) or reject (D) them.
+    Scan unfiltered_saves directory for .npz and .fsc files, display each image, and
+    allow user to save (S) or reject (D) them. Blank and duplicate captures are moved
+    to rejected_saves first unless skip_auto_reject is set.
     """
     # Directory paths
     unfiltered_dir = "unfiltered_saves"
@@ -22,11 +34,14 @@ def scan_unfiltered_images():
         print(f"Error: {unfiltered_dir} directory not found.")
         return
     
-    # Get all .npz files in the unfiltered directory
-    npz_files = [f for f in os.listdir(unfiltered_dir) if f.endswith('.npz')]
+    # Get all capture files in the unfiltered directory
+    if skip_auto_reject:
+        npz_files = [f for f in os.listdir(unfiltered_dir) if f.endswith(('.npz', '.fsc'))]
+    else:
+        npz_files = auto_reject(unfiltered_dir, rejected_dir)
     
     if not npz_files:
-        print(f"No .npz files found in {unfiltered_dir}.")
+        print(f"No .npz or .fsc files found in {unfiltered_dir}.")
         return
     
     print(f"Found {len(npz_files)} files. Starting scan...")
@@ -37,16 +52,13 @@ def scan_unfiltered_images():
         file_path = os.path.join(unfiltered_dir, file_name)
         
         try:
-            # Load the data
-            data = np.load(file_path)
+            # Load the image data
+            img_data = load_capture(file_path)
             
-            if 'display_data' not in data:
+            if img_data is None:
                 print(f"Warning: {file_name} does not contain 'display_data'. Skipping.")
                 continue
             
-            # Get the image data
-            img_data = data['display_data']
-            
             # Scale up the image for better visualization (16x16 is tiny on screen)
             scale_factor = 20
             img_resized = cv2.resize(img_data, 
@@ -97,5 +109,227 @@ def scan_unfiltered_images():
     print("Finished scanning all files.")
     cv2.destroyAllWindows()
 
+def decode_thumbnail(file_path):
+    """
+    Load a capture and scale it to a contact sheet cell. Runs in a worker process.
+    Returns a BGR uint8 cell image, or None if the file could not be read.
+    """
+    try:
+        img_data = load_capture(file_path)
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return None
+    if img_data is None:
+        return None
+    img_data = np.clip(img_data, 0, 255).astype(np.uint8)
+    cell = cv2.resize(img_data, (CELL_WIDTH, CELL_HEIGHT), interpolation=cv2.INTER_NEAREST)
+    return np.ascontiguousarray(cell[:, :, ::-1])
+
+
+class ContactSheet:
+    def __init__(self, file_paths, columns, rows, workers=None):
+        """
+        Pages of capture thumbnails tiled into a grid. Thumbnails are decoded in a
+        process pool, and each page is composited on a helper thread before it is
+        needed, so flipping pages does not wait on disk or decoding.
+
+        :param file_paths: Captures to review, in order
+        :param columns: Cells per row
+        :param rows: Rows per page
+        :param workers: Decoder processes (defaults to the CPU count)
+        """
+        self.file_paths = file_paths
+        self.columns = columns
+        self.rows = rows
+        self.page_size = columns * rows
+        self.page_count = (len(file_paths) + self.page_size - 1) // self.page_size
+        self.decoders = ProcessPoolExecutor(max_workers=workers)
+        self.compositor = ThreadPoolExecutor(max_workers=1)
+        self.pages = {}
+
+    def page_paths(self, page):
+        return self.file_paths[page * self.page_size:(page + 1) * self.page_size]
+
+    def _composite(self, page):
+        cells = list(self.decoders.map(decode_thumbnail, self.page_paths(page), chunksize=4))
+        sheet = np.zeros((self.rows * (CELL_HEIGHT + CELL_GAP) + CELL_GAP,
+                          self.columns * (CELL_WIDTH + CELL_GAP) + CELL_GAP, 3), dtype=np.uint8)
+        for index, cell in enumerate(cells):
+            if cell is None:
+                continue
+            y, x = self.cell_origin(index)
+            sheet[y:y + CELL_HEIGHT, x:x + CELL_WIDTH] = cell
+        return sheet, [cell is not None for cell in cells]
+
+    def request(self, page):
+        """Start building a page in the background if it is not already underway"""
+        if 0 <= page < self.page_count and page not in self.pages:
+            self.pages[page] = self.compositor.submit(self._composite, page)
+
+    def get(self, page):
+        """Returns (sheet image, readable flags) for a page, and starts on the next one"""
+        self.request(page)
+        self.request(page + 1)
+        result = self.pages[page].result()
+        # Keep only the pages around the current one in memory
+        for old in [p for p in self.pages if p < page]:
+            del self.pages[old]
+        return result
+
+    def cell_origin(self, index):
+        row, column = divmod(index, self.columns)
+        return CELL_GAP + row * (CELL_HEIGHT + CELL_GAP), CELL_GAP + column * (CELL_WIDTH + CELL_GAP)
+
+    def cell_at(self, x, y):
+        """Map a click position to a cell index on the page, or None for the gaps"""
+        column, x_offset = divmod(x - CELL_GAP, CELL_WIDTH + CELL_GAP)
+        row, y_offset = divmod(y - CELL_GAP, CELL_HEIGHT + CELL_GAP)
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            return None
+        if x_offset >= CELL_WIDTH or y_offset >= CELL_HEIGHT:
+            return None
+        return row * self.columns + column
+
+    def close(self):
+        self.compositor.shutdown(wait=False, cancel_futures=True)
+        self.decoders.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_contact_sheet(columns=6, rows=5, skip_auto_reject=False):
+    """
+    Review unfiltered_saves a page at a time in a grid.
+
+    Left click toggles a capture between keep and reject, right click toggles its
+    whole row, and the number keys 1-9 toggle rows too. 'S' keeps every undecided
+    capture on the page and moves on, 'D' rejects them and moves on, Space/Enter
+    moves on leaving undecided captures where they are, 'Q' quits. Decisions are
+    applied when leaving a page. Blank and duplicate captures are moved to
+    rejected_saves first unless skip_auto_reject is set.
+    """
+    unfiltered_dir = "unfiltered_saves"
+    filtered_dir = "filtered_saves"
+    rejected_dir = "rejected_saves"
+    os.makedirs(filtered_dir, exist_ok=True)
+    os.makedirs(rejected_dir, exist_ok=True)
+
+    if not os.path.exists(unfiltered_dir):
+        print(f"Error: {unfiltered_dir} directory not found.")
+        return
+
+    if skip_auto_reject:
+        file_names = sorted(f for f in os.listdir(unfiltered_dir) if f.endswith(('.npz', '.fsc')))
+    else:
+        file_names = auto_reject(unfiltered_dir, rejected_dir)
+    if not file_names:
+        print(f"No .npz or .fsc files found in {unfiltered_dir}.")
+        return
+
+    sheet = ContactSheet([os.path.join(unfiltered_dir, f) for f in file_names], columns, rows)
+    print(f"Found {len(file_names)} files on {sheet.page_count} pages.")
+    print("Click: toggle keep/reject, right click or 1-9: toggle row, "
+          "'S' keep page, 'D' reject page, Space: next page, 'Q' quit")
+
+    window_name = "Contact Sheet"
+    cv2.namedWindow(window_name)
+    decisions = {}
+
+    def toggle(indices):
+        # Reject the group unless it is already all rejected, in which case keep it
+        reject = not all(decisions.get(i) == 'reject' for i in indices)
+        for i in indices:
+            decisions[i] = 'reject' if reject else 'keep'
+
+    def on_mouse(event, x, y, flags, param):
+        index = sheet.cell_at(x, y)
+        if index is None or index >= len(param['paths']):
+            return
+        if event == cv2.EVENT_LBUTTONDOWN:
+            decisions[index] = 'keep' if decisions.get(index) == 'reject' else 'reject'
+        elif event == cv2.EVENT_RBUTTONDOWN:
+            row = index // columns
+            toggle(range(row * columns, min((row + 1) * columns, len(param['paths']))))
+        param['dirty'] = True
+
+    try:
+        for page in range(sheet.page_count):
+            paths = sheet.page_paths(page)
+            base, readable = sheet.get(page)
+            decisions.clear()
+            state = {'paths': paths, 'dirty': True}
+            cv2.setMouseCallback(window_name, on_mouse, state)
+            cv2.setWindowTitle(window_name, f"Contact Sheet - page {page + 1}/{sheet.page_count}")
+
+            while True:
+                if state['dirty']:
+                    view = base.copy()
+                    for index, decision in decisions.items():
+                        y, x = sheet.cell_origin(index)
+                        color = KEEP_COLOR if decision == 'keep' else REJECT_COLOR
+                        cv2.rectangle(view, (x - 2, y - 2), (x + CELL_WIDTH + 1, y + CELL_HEIGHT + 1), color, 3)
+                        if decision == 'reject':
+                            cv2.line(view, (x, y), (x + CELL_WIDTH - 1, y + CELL_HEIGHT - 1), color, 2)
+                    cv2.imshow(window_name, view)
+                    state['dirty'] = False
+
+                key = cv2.waitKey(30) & 0xFF
+                if key == 255:
+                    continue
+                if key in (ord('s'), ord('S'), ord('d'), ord('D')):
+                    default = 'keep' if key in (ord('s'), ord('S')) else 'reject'
+                    for index in range(len(paths)):
+                        decisions.setdefault(index, default)
+                    break
+                elif key in (ord(' '), 13, 10):
+                    break
+                elif ord('1') <= key <= ord('9'):
+                    row = key - ord('1')
+                    if row * columns < len(paths):
+                        toggle(range(row * columns, min((row + 1) * columns, len(paths))))
+                        state['dirty'] = True
+                elif key in (ord('q'), ord('Q')):
+                    print("Quitting...")
+                    apply_decisions(paths, decisions, readable, filtered_dir, rejected_dir)
+                    return
+
+            apply_decisions(paths, decisions, readable, filtered_dir, rejected_dir)
+
+        print("Finished scanning all files.")
+    finally:
+        sheet.close()
+        cv2.destroyAllWindows()
+
+
+def apply_decisions(paths, decisions, readable, filtered_dir, rejected_dir):
+    """
+    Move the decided captures of a page into the filtered or rejected directory.
+    Files that could not be decoded are left in place.
+    """
+    kept = rejected = 0
+    for index, decision in decisions.items():
+        if not readable[index]:
+            continue
+        dest_dir = filtered_dir if decision == 'keep' else rejected_dir
+        try:
+            shutil.move(paths[index], os.path.join(dest_dir, os.path.basename(paths[index])))
+        except Exception as e:
+            print(f"Error moving {paths[index]}: {e}")
+            continue
+        if decision == 'keep':
+            kept += 1
+        else:
+            rejected += 1
+    print(f"Kept {kept}, rejected {rejected}")
+
+
 if __name__ == "__main__":
-    scan_unfiltered_images()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Review captures in unfiltered_saves")
+    parser.add_argument("--grid", action="store_true", help="review a page of captures at a time")
+    parser.add_argument("--columns", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--keep-all", action="store_true",
+                        help="show blank and duplicate captures instead of rejecting them automatically")
+    args = parser.parse_args()
+    if args.grid:
+        scan_contact_sheet(args.columns, args.rows, args.keep_all)
+    else:
+        scan_unfiltered_images(args.keep_all)
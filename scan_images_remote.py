@@ -1,14 +1,134 @@
-import os
 import numpy as np
 import cv2
 import io
 import paramiko
-import tempfile
+import queue
+import shlex
+import threading
+from capture_index import CaptureIndex, CaptureClassifier, compute_signature
 
-def scan_unfiltered_images():
+# How many captures to download ahead of the one being reviewed
+PREFETCH_COUNT = 8
+# Number of decisions collected before they are sent to the remote host as one batch
+MOVE_BATCH_SIZE = 20
+# Local sidecar of signatures for captures on the remote host
+REMOTE_INDEX_FILE = "remote_capture_index.sqlite"
+
+
+def load_remote_capture(sftp, remote_file_path):
+    """
+    Download an .npz straight into memory and return its display data (or None).
+    """
+    with sftp.open(remote_file_path, 'rb') as remote_file:
+        remote_file.prefetch()
+        buffer = io.BytesIO(remote_file.read())
+    with np.load(buffer, allow_pickle=True) as data:
+        if 'display_data' not in data:
+            return None
+        return data['display_data'].copy()
+
+
+def prefetch_captures(sftp, remote_dir, entries, results, stop, auto_reject=True):
+    """
+    Thread function that downloads captures in review order. The bounded results
+    queue keeps at most PREFETCH_COUNT images waiting in memory.
+
+    Each capture is also classified against the local signature index: blank or
+    duplicate captures are reported with a verdict instead of an image, and those
+    already known from an earlier session are not downloaded at all.
+    """
+    index = CaptureIndex(REMOTE_INDEX_FILE) if auto_reject else None
+    classifier = CaptureClassifier()
+    try:
+        for file_name, mtime, size in entries:
+            if stop.is_set():
+                break
+            img_data, error, verdict = None, None, None
+            try:
+                signature = index.lookup(file_name, mtime, size) if index else None
+                if signature is not None:
+                    verdict = classifier.classify(signature)
+                if verdict is None:
+                    img_data = load_remote_capture(sftp, f"{remote_dir}/{file_name}")
+                    if index and img_data is not None and signature is None:
+                        signature = compute_signature(img_data)
+                        index.store(file_name, mtime, size, signature)
+                        verdict = classifier.classify(signature)
+                        if verdict is not None:
+                            img_data = None
+            except Exception as e:
+                error = e
+            item = (file_name, img_data, error, verdict)
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+    finally:
+        if index:
+            index.close()
+    if not stop.is_set():
+        results.put(None)
+
+
+class RemoteMover:
+    def __init__(self, ssh_client, batch_size=MOVE_BATCH_SIZE):
+        """
+        Collects review decisions and applies them on the remote host in batches,
+        one exec_command per batch, on a background thread.
+
+        :param ssh_client: Connected paramiko.SSHClient
+        :param batch_size: Decisions per batch
+        """
+        self.ssh_client = ssh_client
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.worker = None
+
+    def move(self, source_path, dest_dir):
+        with self.lock:
+            self.pending.append((source_path, dest_dir))
+            ready = len(self.pending) >= self.batch_size
+        if ready and (self.worker is None or not self.worker.is_alive()):
+            self.worker = threading.Thread(target=self.flush)
+            self.worker.daemon = True
+            self.worker.start()
+
+    def flush(self):
+        """
+        Send all pending moves as a single remote command and report failures.
+        """
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return
+            command = "; ".join(
+                f"mv -- {shlex.quote(source)} {shlex.quote(dest_dir)}/ || echo {shlex.quote(source)} >&2"
+                for source, dest_dir in batch
+            )
+            stdin, stdout, stderr = self.ssh_client.exec_command(command)
+            error = stderr.read().decode().strip()
+            if error:
+                print(f"Error moving files:\n{error}")
+            print(f"Applied {len(batch)} decisions on remote")
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.join()
+        self.flush()
+
+
+def scan_unfiltered_images(auto_reject=True):
     """
     Connect to remote host via SSH, scan unfiltered_saves directory for .npz files, 
     display each image locally, and allow user to save (S) or reject (D) them on the remote system.
+    Upcoming images are downloaded in the background and the moves are applied in batches,
+    so reviewing never waits on the network between images. Unless auto_reject is
+    off, blank and duplicate captures go straight to rejected_saves without being shown.
     """
     # Remote connection details
     remote_host = "192.168.68.50"
@@ -16,11 +136,6 @@ def scan_unfiltered_images():
     remote_password = "temppwd"
     remote_base_path = "~/FS/FutureSketch"
     
-    # Remote directory paths
-    unfiltered_dir = f"{remote_base_path}/unfiltered_saves"
-    filtered_dir = f"{remote_base_path}/filtered_saves"
-    rejected_dir = f"{remote_base_path}/rejected_saves"
-    
     print(f"Connecting to {remote_user}@{remote_host}...")
     
     # Establish SSH connection
@@ -30,33 +145,35 @@ def scan_unfiltered_images():
         ssh_client.connect(hostname=remote_host, username=remote_user, password=remote_password)
         sftp = ssh_client.open_sftp()
         
-        # Create directories if they don't exist
-        for directory in [filtered_dir, rejected_dir]:
-            try:
-                ssh_client.exec_command(f"mkdir -p {directory}")
-            except Exception as e:
-                print(f"Error creating directory {directory}: {e}")
-                return
-        
-        # List files in unfiltered directory
+        # Expand the base path (to handle ~), create the output directories and
+        # list the captures in a single round-trip
         try:
-            # Expand the path (to handle ~)
-            stdin, stdout, stderr = ssh_client.exec_command(f"echo {unfiltered_dir}")
-            expanded_unfiltered_dir = stdout.read().decode().strip()
-            
-            # List .npz files
-            stdin, stdout, stderr = ssh_client.exec_command(f"ls {expanded_unfiltered_dir}/*.npz 2>/dev/null")
-            file_list = stdout.read().decode().strip().split('\n')
-            
-            # Filter out empty entries
-            npz_files = [os.path.basename(f) for f in file_list if f.strip()]
-            
+            stdin, stdout, stderr = ssh_client.exec_command(
+                f"cd {remote_base_path} && mkdir -p filtered_saves rejected_saves && pwd && "
+                f"find unfiltered_saves -maxdepth 1 -name '*.npz' -printf '%f %T@ %s\\n' | sort"
+            )
+            lines = stdout.read().decode().strip().split('\n')
+            expanded_base_path = lines[0]
+            # (name, mtime, size) for each capture, in capture order
+            entries = []
+            for line in lines[1:]:
+                if line.strip():
+                    name, mtime, size = line.rsplit(' ', 2)
+                    entries.append((name, float(mtime), int(size)))
+            npz_files = [entry[0] for entry in entries]
+            if not expanded_base_path:
+                raise RuntimeError(stderr.read().decode().strip() or f"{remote_base_path} not found")
         except Exception as e:
             print(f"Error listing files: {e}")
             ssh_client.close()
             return
         
-        if not npz_files or (len(npz_files) == 1 and not npz_files[0]):
+        # Remote directory paths
+        unfiltered_dir = f"{expanded_base_path}/unfiltered_saves"
+        filtered_dir = f"{expanded_base_path}/filtered_saves"
+        rejected_dir = f"{expanded_base_path}/rejected_saves"
+        
+        if not npz_files:
             print(f"No .npz files found in {unfiltered_dir}.")
             ssh_client.close()
             return
@@ -64,39 +181,35 @@ def scan_unfiltered_images():
         print(f"Found {len(npz_files)} files. Starting scan...")
         print("Press 'S' to save to filtered directory, 'D' to reject, 'Q' to quit")
         
-        # Process each file
-        for i, file_name in enumerate(npz_files):
-            remote_file_path = f"{expanded_unfiltered_dir}/{file_name}"
-            temp_path = None
-            
-            try:
-                # Create a temporary file to store the downloaded .npz
-                temp_file = tempfile.NamedTemporaryFile(suffix='.npz', delete=False)
-                temp_path = temp_file.name
-                temp_file.close()  # Close file handle immediately
-                
-                # Download the file
-                sftp.get(remote_file_path, temp_path)
+        # Start downloading ahead of the reviewer
+        results = queue.Queue(maxsize=PREFETCH_COUNT)
+        stop = threading.Event()
+        prefetcher = threading.Thread(target=prefetch_captures,
+                                      args=(sftp, unfiltered_dir, entries, results, stop, auto_reject))
+        prefetcher.daemon = True
+        prefetcher.start()
+        mover = RemoteMover(ssh_client)
+        
+        try:
+            # Process each file
+            for i in range(len(npz_files)):
+                item = results.get()
+                if item is None:
+                    break
+                file_name, img_data, error, verdict = item
+                remote_file_path = f"{unfiltered_dir}/{file_name}"
                 
-                # Load the data - use a with statement to ensure proper closing
-                img_data = None
-                with np.load(temp_path, allow_pickle=True) as data:
-                    if 'display_data' not in data:
-                        print(f"Warning: {file_name} does not contain 'display_data'. Skipping.")
-                        # Clean up before continuing
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                        continue
-                    
-                    # Copy the data to a new variable before closing the file
-                    img_data = data['display_data'].copy()
+                if verdict is not None:
+                    mover.move(remote_file_path, rejected_dir)
+                    print(f"Auto-rejected {verdict} capture {file_name}")
+                    continue
                 
-                # Clean up the temporary file
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except Exception as e:
-                        print(f"Warning: Could not delete temporary file {temp_path}: {e}")
+                if error is not None:
+                    print(f"Error processing {file_name}: {error}")
+                    continue
+                if img_data is None:
+                    print(f"Warning: {file_name} does not contain 'display_data'. Skipping.")
+                    continue
                 
                 # Scale up the image for better visualization
                 scale_factor = 20
@@ -117,34 +230,21 @@ def scan_unfiltered_images():
                     key = cv2.waitKey(0) & 0xFF
                     
                     if key == ord('s') or key == ord('S'):
-                        # Move to filtered directory on remote
-                        stdin, stdout, stderr = ssh_client.exec_command(
-                            f"mv {remote_file_path} {filtered_dir}/{file_name}"
-                        )
-                        error = stderr.read().decode()
-                        if error:
-                            print(f"Error moving file: {error}")
-                        else:
-                            print(f"Moved to {filtered_dir}/{file_name}")
+                        # Queue the move to the filtered directory on remote
+                        mover.move(remote_file_path, filtered_dir)
+                        print(f"Saving to {filtered_dir}/{file_name}")
                         break
                         
                     elif key == ord('d') or key == ord('D'):
-                        # Move to rejected directory on remote
-                        stdin, stdout, stderr = ssh_client.exec_command(
-                            f"mv {remote_file_path} {rejected_dir}/{file_name}"
-                        )
-                        error = stderr.read().decode()
-                        if error:
-                            print(f"Error moving file: {error}")
-                        else:
-                            print(f"Rejected: Moved to {rejected_dir}/{file_name}")
+                        # Queue the move to the rejected directory on remote
+                        mover.move(remote_file_path, rejected_dir)
+                        print(f"Rejecting to {rejected_dir}/{file_name}")
                         break
                         
                     elif key == ord('q') or key == ord('Q'):
                         # Quit the program
                         print("Quitting...")
                         cv2.destroyAllWindows()
-                        ssh_client.close()
                         return
                         
                     else:
@@ -152,18 +252,13 @@ def scan_unfiltered_images():
                 
                 # Close the window
                 cv2.destroyWindow(window_name)
-                
-            except Exception as e:
-                print(f"Error processing {file_name}: {e}")
-                # Make sure to clean up temp file if it exists
-                if temp_path and os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-        
-        print("Finished scanning all files.")
-        cv2.destroyAllWindows()
+            
+            print("Finished scanning all files.")
+            cv2.destroyAllWindows()
+        finally:
+            # Apply every decision made so far, even when quitting early
+            stop.set()
+            mover.close()
         
     except Exception as e:
         print(f"Connection error: {e}")
@@ -174,4 +269,4 @@ def scan_unfiltered_images():
             print("SSH connection closed.")
 
 if __name__ == "__main__":
-    scan_unfiltered_images()
\ No newline at end of file
+    scan_unfiltered_images()
@@ -0,0 +1,165 @@
+import argparse
+import queue
+import numpy as np
+
+COUNTS_PER_G = 16384.0  # MPU6050 at +-2g
+
+
+class ShakeDetector:
+    def __init__(self, sample_rate=200, gravity_window=1.0, energy_window=0.3,
+                 on_threshold=0.3, off_threshold=0.1, refractory=2.0, counts_per_g=COUNTS_PER_G,
+                 max_events=16):
+        """
+        Streaming shake detector for raw accelerometer samples. Each batch is
+        processed with whole-array operations:
+
+        - gravity is removed by subtracting a moving average (high-pass),
+        - the remaining motion energy (g^2, summed over axes) is averaged over a sliding window,
+        - a shake starts when the energy rises above on_threshold and ends when it
+          falls below off_threshold (hysteresis),
+        - after a shake starts no new one is reported for the refractory period.
+
+        A single bump barely moves the windowed energy, while a slow but vigorous
+        shake keeps it high, which is what a fixed sample-to-sample threshold gets wrong.
+
+        :param sample_rate: Rate of the incoming samples in Hz
+        :param gravity_window: Length in seconds of the moving average taken as gravity
+        :param energy_window: Length in seconds of the energy averaging window
+        :param on_threshold: Windowed energy (g^2) that starts a shake
+        :param off_threshold: Windowed energy (g^2) below which a shake is over
+        :param refractory: Seconds after a shake starts during which no new shake is reported
+        :param counts_per_g: Raw sensor counts per g
+        :param max_events: Shakes kept for get_events(); older ones are dropped if nobody reads them
+        """
+        self.sample_rate = sample_rate
+        self.gravity_len = max(2, int(round(gravity_window * sample_rate)))
+        self.window_len = max(2, int(round(energy_window * sample_rate)))
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.refractory = refractory
+        self.counts_per_g = counts_per_g
+
+        self.events = queue.Queue(maxsize=max_events)
+        self.reset()
+
+    def reset(self):
+        self.history = None
+        self.energy_history = np.zeros(self.window_len - 1)
+        self.active = False
+        self.refractory_until = -np.inf
+        self.samples_seen = 0
+        self.last_energy = np.zeros(0)
+
+    def process(self, samples, times=None):
+        """
+        Feed a batch of samples.
+
+        :param samples: (N, 3) raw accelerometer counts, oldest first
+        :param times: (N,) sample times in seconds; derived from the sample rate if omitted
+        :return: List of times at which a shake started within this batch
+        """
+        x = np.asarray(samples, dtype=float).reshape(-1, 3) / self.counts_per_g
+        n = len(x)
+        if n == 0:
+            return []
+        if times is None:
+            times = (self.samples_seen + np.arange(n)) / self.sample_rate
+        times = np.asarray(times, dtype=float)
+        self.samples_seen += n
+
+        if self.history is None:
+            # Assume the sensor was at rest before the first sample
+            self.history = np.repeat(x[:1], self.gravity_len - 1, axis=0)
+
+        # High-pass: subtract the moving average over the last gravity_len samples
+        full = np.vstack([self.history, x])
+        cumulative = np.vstack([np.zeros((1, 3)), np.cumsum(full, axis=0)])
+        gravity = (cumulative[self.gravity_len:] - cumulative[:-self.gravity_len]) / self.gravity_len
+        motion = x - gravity
+
+        # Windowed energy of what is left
+        instant = (motion ** 2).sum(axis=1)
+        energy_full = np.concatenate([self.energy_history, instant])
+        cumulative_energy = np.concatenate([[0.0], np.cumsum(energy_full)])
+        energy = (cumulative_energy[self.window_len:] - cumulative_energy[:-self.window_len]) / self.window_len
+
+        self.history = full[len(full) - (self.gravity_len - 1):]
+        self.energy_history = energy_full[len(energy_full) - (self.window_len - 1):]
+        self.last_energy = energy
+
+        # Hysteresis: jump straight from one transition to the next
+        events = []
+        i = 0
+        while i < n:
+            if not self.active:
+                start = np.flatnonzero((energy[i:] > self.on_threshold) & (times[i:] >= self.refractory_until))
+                if len(start) == 0:
+                    break
+                i += start[0]
+                self.active = True
+                self.refractory_until = times[i] + self.refractory
+                events.append(float(times[i]))
+                self._queue_event(float(times[i]))
+            else:
+                stop = np.flatnonzero(energy[i:] < self.off_threshold)
+                if len(stop) == 0:
+                    break
+                i += stop[0]
+                self.active = False
+        return events
+
+    def _queue_event(self, event):
+        # process() already returns its events, so the queue may have no reader: drop the oldest
+        while True:
+            try:
+                self.events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get_events(self):
+        """
+        Drain and return shake start times reported since the last call.
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+def detect_shakes(samples, sample_rate=200, **kwargs):
+    """
+    Run the detector over a whole recorded trace in one go, for offline tuning.
+
+    :param samples: (N, 3) raw accelerometer counts
+    :return: (event_times, energy) where energy is the windowed energy per sample
+    """
+    detector = ShakeDetector(sample_rate=sample_rate, **kwargs)
+    events = detector.process(samples)
+    return events, detector.last_energy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the shake detector over a recorded accelerometer trace (.npy or .csv of x,y,z counts)")
+    parser.add_argument("trace")
+    parser.add_argument("--rate", type=float, default=200, help="sample rate of the trace in Hz")
+    parser.add_argument("--on", type=float, default=0.3, help="energy (g^2) that starts a shake")
+    parser.add_argument("--off", type=float, default=0.1, help="energy (g^2) that ends a shake")
+    parser.add_argument("--window", type=float, default=0.3, help="energy window in seconds")
+    parser.add_argument("--refractory", type=float, default=2.0, help="seconds between reported shakes")
+    args = parser.parse_args()
+
+    if args.trace.endswith('.npy'):
+        trace = np.load(args.trace)
+    else:
+        trace = np.loadtxt(args.trace, delimiter=',')
+    events, energy = detect_shakes(trace[:, :3], args.rate, energy_window=args.window,
+                                   on_threshold=args.on, off_threshold=args.off, refractory=args.refractory)
+    print(f"{len(trace)} samples ({len(trace) / args.rate:.1f}s), peak energy {energy.max():.3f} g^2")
+    for t in events:
+        print(f"Shake at {t:.2f}s")
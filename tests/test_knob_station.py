@@ -0,0 +1,71 @@
+import threading
+import numpy as np
+import pytest
+from knob_station import KIND_BUTTON, KIND_ENCODER, KnobStationAgent, RemoteInputMerger, encode_packet
+
+
+class FakeEncoders:
+    def __init__(self, count):
+        self.positions = np.zeros(count, dtype=int)
+        self.button_state = np.zeros(count, dtype=int)
+        self.lock = threading.Lock()
+
+
+class CapturingSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, address):
+        self.sent.append(data)
+
+
+@pytest.fixture
+def merger():
+    merger = RemoteInputMerger([7], 2, min_values=[0, 0], max_values=[37, 61], port=0,
+                               bind_address='127.0.0.1')
+    yield merger
+    merger.cleanup()
+
+
+def test_sequence_gaps_count_as_lost(merger):
+    for seq in (0, 1, 4):
+        assert merger.handle_packet(encode_packet(7, 1, seq, [(KIND_ENCODER, 0, seq)]))
+    assert merger.get_stats()['lost'] == 2
+    assert merger.positions[0] == 4
+
+
+def test_duplicate_and_late_packets_are_stale(merger):
+    merger.handle_packet(encode_packet(7, 1, 10, [(KIND_ENCODER, 0, 10)]))
+    assert not merger.handle_packet(encode_packet(7, 1, 10, [(KIND_ENCODER, 0, 11)]))
+    assert not merger.handle_packet(encode_packet(7, 1, 9, [(KIND_ENCODER, 0, 9)]))
+    assert merger.get_stats()['stale'] == 2
+    assert merger.positions[0] == 10
+
+    # A restarted station has a new session and starts its sequence again
+    assert merger.handle_packet(encode_packet(7, 2, 0, [(KIND_ENCODER, 0, 3)]))
+    assert merger.positions[0] == 3
+
+
+def test_unknown_station_and_out_of_range_values(merger):
+    assert not merger.handle_packet(encode_packet(8, 1, 0, [(KIND_ENCODER, 0, 5)]))
+    merger.handle_packet(encode_packet(7, 1, 0, [(KIND_ENCODER, 1, 500), (KIND_BUTTON, 1, 1)]))
+    assert merger.positions[1] == 61
+    assert merger.button_state[1] == 1
+
+
+def test_absolute_state_resyncs_after_a_lost_packet(merger):
+    encoders = FakeEncoders(2)
+    agent = KnobStationAgent(encoders, ('127.0.0.1', 0), station_id=7, absolute_interval=0.5)
+    agent.sock = CapturingSocket()
+
+    agent.step(now=0.0)  # first packet carries the full state
+    encoders.positions[:] = [5, 9]
+    agent.step(now=0.1)  # delta, lost on the way
+    agent.step(now=0.2)  # nothing changed: nothing sent
+    agent.step(now=0.6)  # periodic full state
+    assert len(agent.sock.sent) == 3
+
+    merger.handle_packet(agent.sock.sent[0])
+    merger.handle_packet(agent.sock.sent[2])
+    np.testing.assert_array_equal(merger.positions, [5, 9])
+    assert merger.get_stats()['lost'] == 1
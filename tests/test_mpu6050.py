@@ -0,0 +1,78 @@
+import numpy as np
+from mpu6050 import MPU6050, FakeSMBus, FIFO_R_W, FIFO_SIZE, MAX_BLOCK_READ, SAMPLE_BYTES
+from shake_detector import ShakeDetector, COUNTS_PER_G
+
+
+class RecordingBus(FakeSMBus):
+    def __init__(self):
+        super().__init__()
+        self.fifo_reads = []
+
+    def read_i2c_block_data(self, address, register, length):
+        if register == FIFO_R_W:
+            self.fifo_reads.append(length)
+        return super().read_i2c_block_data(address, register, length)
+
+
+def calm(count, z=COUNTS_PER_G):
+    return np.tile([0, 0, int(z)], (count, 1))
+
+
+def test_fifo_drain_reads_whole_samples_in_block_sized_chunks():
+    bus = RecordingBus()
+    mpu = MPU6050(bus, shake_threshold=1 << 20)
+    samples = np.arange(150).reshape(50, 3)
+    bus.push_samples(samples)
+
+    assert mpu.poll() == 50
+    stored, _ = mpu.get_samples()
+    np.testing.assert_array_equal(stored, samples)
+    assert len(bus.fifo) == 0
+    assert max(bus.fifo_reads) <= MAX_BLOCK_READ
+    assert all(length % SAMPLE_BYTES == 0 for length in bus.fifo_reads)
+
+
+def test_fifo_overflow_resets_and_resumes_aligned():
+    bus = FakeSMBus()
+    mpu = MPU6050(bus, shake_threshold=1 << 20)
+    bus.push_samples(calm(FIFO_SIZE // SAMPLE_BYTES + 10))
+
+    assert mpu.poll() == 0
+    assert mpu.overflows == 1
+    assert len(bus.fifo) == 0
+
+    bus.push_samples([[1, 2, 3], [4, 5, 6]])
+    assert mpu.poll() == 2
+    stored, _ = mpu.get_samples()
+    np.testing.assert_array_equal(stored, [[1, 2, 3], [4, 5, 6]])
+
+
+def test_threshold_shake_flag_is_consumed_once():
+    bus = FakeSMBus()
+    mpu = MPU6050(bus, shake_threshold=10000)
+    bus.push_samples(calm(20))
+    mpu.poll()
+    assert not mpu.consume_shake()
+
+    bus.push_samples([[20000, 0, 16384]])
+    mpu.poll()
+    assert mpu.consume_shake()
+    assert not mpu.consume_shake()
+
+
+def test_detector_flags_a_shake_but_not_a_still_sensor():
+    rate = 200
+    bus = FakeSMBus()
+    mpu = MPU6050(bus, sample_rate=rate, detector=ShakeDetector(sample_rate=rate))
+    for _ in range(5):
+        bus.push_samples(calm(rate // 5))
+        mpu.poll()
+    assert not mpu.consume_shake()
+
+    t = np.arange(rate) / rate
+    shake = calm(rate)
+    shake[:, 0] = (1.5 * COUNTS_PER_G * np.sin(2 * np.pi * 5 * t)).astype(int)
+    for chunk in np.array_split(shake, 5):
+        bus.push_samples(chunk)
+        mpu.poll()
+    assert mpu.consume_shake()
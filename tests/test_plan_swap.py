@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from brush import stamp_spot
+from dirty_canvas import DirtyCanvas
+from output_rate import AdaptiveOutputRate, frame_to_send
+
+pytest.importorskip('sacn')
+from ImageToDMX import SACNPixelSender
+
+
+class FakeOutput:
+    destination = None
+    dmx_data = b''
+
+
+class FakeSender:
+    def __init__(self):
+        self.outputs = {}
+
+    def start(self):
+        pass
+
+    def activate_output(self, universe):
+        self.outputs[universe] = FakeOutput()
+
+    def deactivate_output(self, universe):
+        del self.outputs[universe]
+
+    def __getitem__(self, universe):
+        return self.outputs[universe]
+
+
+def row_major_plan(shape, rows):
+    """One receiver per row, addressed left to right"""
+    return [{'ip': '127.0.0.1', 'pixel_count': shape[1],
+             'addressing_array': np.array([(row, col) for col in range(shape[1])])} for row in range(rows)]
+
+
+def test_new_plan_fills_every_universe_mid_draw():
+    shape = (38, 62, 3)
+    canvas = DirtyCanvas(shape)
+    canvas.load(np.full(shape, 200))
+    output_rate = AdaptiveOutputRate()
+    sender = SACNPixelSender(row_major_plan(shape, 2), sender=FakeSender())
+    sender.send(*frame_to_send(canvas, output_rate))
+
+    # Grow the plan, then keep drawing in one corner
+    sender.apply_plan(row_major_plan(shape, 14))
+    output_rate.wake()
+    canvas.mark(stamp_spot(canvas.pixels, 0, 0, 2, (255, 0, 0)))
+    frame, dirty = frame_to_send(canvas, output_rate)
+    assert dirty is not None
+    sender.send(frame, dirty)
+
+    assert len(sender.sender.outputs) == 14
+    for universe, output in sender.sender.outputs.items():
+        assert any(output.dmx_data), f"universe {universe} left dark"
+
+    # Later sends go back to the dirty universes only
+    sender.sender[14].dmx_data = b''
+    canvas.mark(stamp_spot(canvas.pixels, 0, 0, 4, (0, 255, 0)))
+    sender.send(*frame_to_send(canvas, output_rate))
+    assert sender.sender[14].dmx_data == b''
@@ -0,0 +1,289 @@
+import multiprocessing
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from brush import stamp_spot
+
+# Shared memory layout:
+#   control - frame number, cursor pair count, decay flag, send flag, stop flag (int64 each)
+#   cursors - per pair: x, y, size, color index (int32)
+#   canvas  - rows * cols * 3 float32, shared by every tile worker
+CONTROL_FIELDS = 8
+CTRL_FRAME, CTRL_PAIRS, CTRL_DECAY, CTRL_SEND, CTRL_STOP = range(5)
+MAX_PAIRS = 64
+DEFAULT_NAME = "futuresketch_tiles"
+UNIVERSE_SIZE = 170
+# Workers are forked: FS.py has no __main__ guard, so with spawn or forkserver each
+# worker would re-import it and start the whole installation again
+mp_context = multiprocessing.get_context('fork')
+
+
+def _layout(rows, cols):
+    cursors_offset = CONTROL_FIELDS * 8
+    canvas_offset = cursors_offset + MAX_PAIRS * 4 * 4
+    canvas_offset += -canvas_offset % 64  # align canvas data
+    return cursors_offset, canvas_offset, canvas_offset + rows * cols * 3 * 4
+
+
+def universe_starts(receivers, start_universe=1):
+    """
+    First universe of each receiver, numbered the same way SACNPixelSender does
+    (sequentially, unless a receiver fixes its own 'universe').
+    """
+    starts = []
+    universe = start_universe
+    for receiver in receivers:
+        universe = receiver.get('universe', universe)
+        starts.append(universe)
+        universe += -(-receiver['pixel_count'] // UNIVERSE_SIZE)
+    return starts
+
+
+def footprint(receiver, rows, cols):
+    """Bounding box (row_min, row_max + 1, col_min, col_max + 1) of the pixels a receiver drives"""
+    coords = receiver['addressing_array']
+    r = np.clip(coords[:, 0], 0, rows - 1)
+    c = np.clip(coords[:, 1], 0, cols - 1)
+    return int(r.min()), int(r.max()) + 1, int(c.min()), int(c.max()) + 1
+
+
+def plan_tiles(receivers, rows, cols):
+    """
+    Split the canvas into rectangles owned by one receiver each. The grid is cut
+    along every footprint edge; each cell goes to the first receiver whose
+    footprint contains it, or to the nearest one, so every pixel is decayed and
+    stamped by exactly one worker.
+
+    :return: List (per receiver) of lists of (row_start, row_end, col_start, col_end)
+    """
+    boxes = [footprint(receiver, rows, cols) for receiver in receivers]
+    row_cuts = sorted({0, rows} | {b[0] for b in boxes} | {b[1] for b in boxes})
+    col_cuts = sorted({0, cols} | {b[2] for b in boxes} | {b[3] for b in boxes})
+    centres = np.array([((b[0] + b[1]) / 2, (b[2] + b[3]) / 2) for b in boxes])
+    tiles = [[] for _ in receivers]
+    for r0, r1 in zip(row_cuts[:-1], row_cuts[1:]):
+        for c0, c1 in zip(col_cuts[:-1], col_cuts[1:]):
+            owner = next((i for i, b in enumerate(boxes)
+                          if b[0] <= r0 and r1 <= b[1] and b[2] <= c0 and c1 <= b[3]), None)
+            if owner is None:
+                owner = int(np.argmin(np.hypot(centres[:, 0] - (r0 + r1) / 2, centres[:, 1] - (c0 + c1) / 2)))
+            tiles[owner].append((r0, r1, c0, c1))
+    return tiles
+
+
+def _tile_worker(receiver, rects, start_universe, shm_name, shape, pair_colors, decay_rate, output,
+                 start_barrier, stamped_barrier, done_barrier):
+    """
+    Worker process for one tile: decays and stamps its own rectangles, then
+    sends its receiver's universes once every tile has finished drawing.
+    """
+    rows, cols, _ = shape
+    shm = shared_memory.SharedMemory(name=shm_name)
+    cursors_offset, canvas_offset, _ = _layout(rows, cols)
+    control = np.ndarray((CONTROL_FIELDS,), dtype=np.int64, buffer=shm.buf)
+    cursors = np.ndarray((MAX_PAIRS, 4), dtype=np.int32, buffer=shm.buf, offset=cursors_offset)
+    canvas = np.ndarray(shape, dtype=np.float32, buffer=shm.buf, offset=canvas_offset)
+    views = [(r0, c0, canvas[r0:r1, c0:c1]) for r0, r1, c0, c1 in rects]
+
+    # The receiver only samples its own footprint, so convert just those rows for sending
+    f_r0, f_r1, _, _ = footprint(receiver, rows, cols)
+    local_receiver = dict(receiver)
+    local_receiver['addressing_array'] = np.clip(receiver['addressing_array'], 0, [rows - 1, cols - 1]) - [f_r0, 0]
+    sender = None
+    if output:
+        import ImageToDMX as imdmx
+        sender = imdmx.SACNPixelSender([local_receiver], start_universe)
+    send_buffer = np.zeros((f_r1 - f_r0, cols, 3), dtype=np.uint8)
+    colors = np.asarray(pair_colors, dtype=float)
+
+    try:
+        while True:
+            start_barrier.wait()
+            if control[CTRL_STOP]:
+                break
+            for r0, c0, view in views:
+                if control[CTRL_DECAY]:
+                    view *= decay_rate
+                for x, y, size, color_index in cursors[:control[CTRL_PAIRS]].tolist():
+                    stamp_spot(view, x - r0, y - c0, size, colors[color_index])
+            # Senders read pixels owned by neighbouring tiles, so wait until all are drawn
+            stamped_barrier.wait()
+            if control[CTRL_SEND] and sender is not None:
+                np.copyto(send_buffer, canvas[f_r0:f_r1], casting='unsafe')
+                sender.send(send_buffer)
+            done_barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    finally:
+        if sender is not None:
+            sender.close()
+        views = canvas = control = cursors = None
+        shm.close()
+
+
+class TiledRenderer:
+    def __init__(self, receivers, shape, pair_colors, decay_rate, start_universe=1, name=DEFAULT_NAME,
+                 timeout=2.0, output=True):
+        """
+        Renders the canvas with one worker process per receiver. The canvas lives
+        in shared memory, split into tiles aligned with each receiver's footprint;
+        each worker decays and stamps the cursors on its tile and sends its own
+        receiver's universes, so throughput scales with the number of cores.
+
+        :param receivers: Receiver dicts as passed to SACNPixelSender
+        :param shape: Canvas shape (rows, cols, 3)
+        :param pair_colors: RGB colors indexed by each pair's color button
+        :param decay_rate: Factor applied to the canvas on decay frames
+        :param start_universe: First sACN universe, as for SACNPixelSender
+        :param name: Shared memory segment name
+        :param timeout: Seconds to wait for the workers before giving up on a frame
+        :param output: Open the sACN senders; False renders without any network output
+        """
+        rows, cols, _ = shape
+        cursors_offset, canvas_offset, size = _layout(rows, cols)
+        try:
+            # A segment left behind by a previous run that did not exit cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.control = np.ndarray((CONTROL_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.cursors = np.ndarray((MAX_PAIRS, 4), dtype=np.int32, buffer=self.shm.buf, offset=cursors_offset)
+        self.canvas = np.ndarray(shape, dtype=np.float32, buffer=self.shm.buf, offset=canvas_offset)
+        self.control[:] = 0
+        self.canvas[:] = 0
+        self.timeout = timeout
+        self.tiles = plan_tiles(receivers, rows, cols)
+        self.worker_args = [(receiver, rects, universe, name, tuple(shape), pair_colors, decay_rate, output)
+                            for receiver, rects, universe in
+                            zip(receivers, self.tiles, universe_starts(receivers, start_universe))]
+        self.restarts = 0
+        self.workers = []
+        self._start_workers()
+
+    def _start_workers(self):
+        worker_count = len(self.worker_args)
+        self.start_barrier = mp_context.Barrier(worker_count + 1)
+        self.stamped_barrier = mp_context.Barrier(worker_count)
+        self.done_barrier = mp_context.Barrier(worker_count + 1)
+        self.workers = []
+        for args in self.worker_args:
+            worker = mp_context.Process(
+                target=_tile_worker,
+                args=args + (self.start_barrier, self.stamped_barrier, self.done_barrier))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def _stop_workers(self):
+        # Breaking the barriers releases every waiting worker, which then exits
+        for barrier in (self.start_barrier, self.stamped_barrier, self.done_barrier):
+            barrier.abort()
+        for worker in self.workers:
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join(timeout=1.0)
+            if worker.is_alive():
+                # Stopped processes do not act on SIGTERM
+                worker.kill()
+                worker.join(timeout=1.0)
+
+    def restart(self):
+        """
+        Replace all workers after one died or hung. The canvas is in shared
+        memory, so the drawing carries on where it was.
+        """
+        # Healthy workers exit cleanly once the barrier breaks; a crashed one has a non-zero exit code
+        crashed = [i for i, worker in enumerate(self.workers) if worker.exitcode not in (None, 0)]
+        print(f"Tile workers stopped responding ({f'crashed: {crashed}' if crashed else 'hung'}); restarting them")
+        self._stop_workers()
+        self.control[CTRL_STOP] = 0
+        self.restarts += 1
+        self._start_workers()
+
+    def render(self, positions, buttons, decay=False, send=True):
+        """
+        Run one frame across all tiles: broadcast the cursor state, let every
+        worker decay/stamp its tile and send, and wait until they are done.
+
+        :param positions: Encoder positions [x1, y1, x2, y2, ...]
+        :param buttons: Button states; per pair, brush size then color index
+        :param decay: Apply the decay factor this frame
+        :param send: Send the universes this frame
+        :return: False if the workers failed and were restarted, so this frame was dropped
+        """
+        pairs = min(len(positions) // 2, MAX_PAIRS)
+        self.cursors[:pairs, 0] = positions[0:pairs * 2:2]
+        self.cursors[:pairs, 1] = positions[1:pairs * 2:2]
+        self.cursors[:pairs, 2] = buttons[0:pairs * 2:2]
+        self.cursors[:pairs, 3] = buttons[1:pairs * 2:2]
+        self.control[CTRL_PAIRS] = pairs
+        self.control[CTRL_DECAY] = decay
+        self.control[CTRL_SEND] = send
+        self.control[CTRL_FRAME] += 1
+        try:
+            self.start_barrier.wait(self.timeout)
+            self.done_barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            self.restart()
+            return False
+        return True
+
+    def load(self, frame):
+        """Replace the whole canvas (gallery image, replay frame) between frames"""
+        np.copyto(self.canvas, frame, casting='unsafe')
+
+    def close(self):
+        self.control[CTRL_STOP] = 1
+        try:
+            self.start_barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            pass
+        self._stop_workers()
+        self.control = self.cursors = self.canvas = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+if __name__ == "__main__":
+    # Time the tiled renderer against the single-process loop on a synthetic wall
+    # of 2x4 receivers, without network output
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark tiled rendering")
+    parser.add_argument("--rows", type=int, default=160)
+    parser.add_argument("--cols", type=int, default=240)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    rows, cols = args.rows, args.cols
+    receivers = []
+    for r in range(2):
+        for c in range(4):
+            rr, cc = np.mgrid[r * rows // 2:(r + 1) * rows // 2, c * cols // 4:(c + 1) * cols // 4]
+            coords = np.stack([rr.ravel(), cc.ravel()], axis=1)
+            receivers.append({'ip': '127.0.0.1', 'pixel_count': len(coords), 'addressing_array': coords})
+    colors = [[0, 255, 0], [255, 0, 0], [0, 0, 255], [255, 255, 0], [255, 0, 255], [0, 255, 255]]
+    positions = np.array([10, 20, 80, 120, 150, 230, 40, 200])
+    buttons = np.array([4, 0, 3, 1, 5, 2, 2, 3])
+
+    dat = np.zeros((rows, cols, 3))
+    start = time.time()
+    for _ in range(args.frames):
+        dat = dat * 0.995
+        for i in range(len(positions) // 2):
+            stamp_spot(dat, positions[i * 2], positions[i * 2 + 1], buttons[i * 2], colors[buttons[i * 2 + 1]])
+    single = (time.time() - start) / args.frames
+
+    renderer = TiledRenderer(receivers, (rows, cols, 3), colors, 0.995, output=False)
+    renderer.render(positions, buttons, send=False)
+    start = time.time()
+    for _ in range(args.frames):
+        renderer.render(positions, buttons, decay=True, send=False)
+    tiled = (time.time() - start) / args.frames
+    renderer.close()
+    print(f"single process: {1000 * single:.2f} ms/frame, tiled ({len(receivers)} workers): "
+          f"{1000 * tiled:.2f} ms/frame")
@@ -0,0 +1,73 @@
+import time
+from collections import deque
+import numpy as np
+
+
+class UniversePacer:
+    def __init__(self, frame_interval, fraction=0.5, spin=0.0005, history=2000):
+        """
+        Spreads a frame's universe packets evenly over a fraction of the frame
+        interval instead of sending them back to back, so a controller's receive
+        buffer (or a small switch's queue) sees a steady trickle rather than a
+        burst. The cost is latency: the last universe leaves up to
+        fraction * frame_interval after the first.
+
+        Waits sleep until just before each slot and spin the rest of the way,
+        as time.sleep alone overshoots by around a tick on a loaded board.
+
+        :param frame_interval: Seconds between frames sent
+        :param fraction: Part of the frame interval the packets are spread over (0 sends in one burst)
+        :param spin: Seconds before each slot to stop sleeping and busy-wait
+        :param history: Number of packet spacings kept for get_stats()
+        """
+        self.frame_interval = frame_interval
+        self.fraction = fraction
+        self.spin = spin
+        self.spacings = deque(maxlen=history)
+        self.lateness = deque(maxlen=history)
+        self.frames = 0
+        self.packets = 0
+
+    @property
+    def window(self):
+        return self.frame_interval * self.fraction
+
+    def pace(self, items):
+        """
+        Yield items one at a time, each at its slot in the window. Send each one
+        as it is yielded.
+        """
+        items = list(items)
+        if not items:
+            return
+        self.frames += 1
+        step = self.window / len(items)
+        start = time.perf_counter()
+        last = None
+        for i, item in enumerate(items):
+            due = start + i * step
+            remaining = due - time.perf_counter()
+            if remaining > self.spin:
+                time.sleep(remaining - self.spin)
+            while time.perf_counter() < due:
+                pass
+            now = time.perf_counter()
+            self.lateness.append(now - due)
+            if last is not None:
+                self.spacings.append(now - last)
+            last = now
+            self.packets += 1
+            yield item
+
+    def get_stats(self):
+        """
+        Measured spacing between consecutive packets of a frame and how late
+        packets left their slot, in milliseconds.
+        """
+        stats = {'frames': self.frames, 'packets': self.packets, 'window_ms': 1000 * self.window}
+        if self.spacings:
+            spacings = 1000 * np.array(self.spacings)
+            stats['spacing_ms'] = dict(zip(('min', 'p50', 'p99'), np.percentile(spacings, [0, 50, 99]).tolist()))
+        if self.lateness:
+            stats['late_p99_ms'] = 1000 * float(np.percentile(self.lateness, 99))
+        return stats